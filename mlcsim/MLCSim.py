@@ -3,7 +3,16 @@
 """MLCSim class
 
 This module provides the `MLCSim` class, which is used for encoding
-and decoding values to and from its MLC configuration.
+and decoding values to and from its MLC configuration, either one value
+at a time or vectorized over whole arrays of values.
+
+By default the bits of a cell map to its level as a plain binary number.
+A level mapping can be given per cell to store some other code instead,
+i.e. Gray code, see `mapping`.
+
+Words of up to 64 bits are encoded and decoded with uint64 array kernels,
+including one value at a time. Wider words fall back to a separate, much
+slower path using Python ints.
 
 When called directly as main, it allows for encoding and decoding a value
 using a cell configuration json.
@@ -11,7 +20,7 @@ using a cell configuration json.
 ```
 $ python -m mlcsim.MLCSim --help
 
-usage: MLCSim.py [-h] -f F {enc,dec} val
+usage: MLCSim.py [-h] -f F [-m M] {enc,dec} val
 
 positional arguments:
   {enc,dec}   action to take on value
@@ -20,27 +29,61 @@ positional arguments:
 options:
   -h, --help  show this help message and exit
   -f F        cell config json
+  -m M        level mapping json
 ```
 """
 
 import argparse
 import json
 from ast import literal_eval
-from typing import List
+from typing import List, Optional
+
+import numpy as np
 
 
 class MLCSim:
-    def __init__(self, config: List[List[int]]):
+    def __init__(
+        self, config: List[List[int]], mappings: Optional[List[List[int]]] = None
+    ):
         """init MLCSim
 
         Args:
             config (list): Cell configuration
+            mappings (list): Code stored at each level of each cell, defaults to binary
+
+        Raises:
+            ValueError: If a mapping isn't a permutation of the cell's codes
         """
         self.b = len(config[0])
         self.c = len(config)
         self.L = self.b * self.c
         self.config = config
 
+        if mappings is None:
+            mappings = [list(range(2**self.b))] * self.c
+        for mapping in mappings:
+            if sorted(mapping) != list(range(2**self.b)):
+                raise ValueError(f"Mapping {mapping} is not a permutation")
+        self.mappings = mappings
+        # level of each cell storing each code
+        self.levels = np.argsort(np.array(mappings, dtype=np.int64), axis=1).astype(
+            np.uint8
+        )
+
+        # words too wide for uint64 take the slow path
+        self.wide = self.L > 64
+
+        # value contributed by each cell at each of its levels
+        self.dec_table = np.zeros(
+            (self.c, 2**self.b), dtype=object if self.wide else np.uint64
+        )
+        for d, cell in enumerate(config):
+            for level in range(2**self.b):
+                code = mappings[d][level]
+                self.dec_table[d, level] = sum(
+                    (code >> i & 1) << bit for i, bit in enumerate(cell)
+                )
+
     def checkVal(self, val: int):
         """Check if value can be stored in the MLC
 
@@ -76,13 +119,9 @@ class MLCSim:
             list: List representing the cells values
         """
         self.checkVal(val)
-        out: List[int] = []
-        for cell in self.config:
-            count = 0
-            for i, bit in enumerate(cell):
-                count += bool(val & 2**bit) << i
-            out.append(count)
-        return out
+        if self.wide:
+            return self._encWide(val)
+        return self.encArray(np.array([val], dtype=np.uint64))[0].tolist()
 
     def dec(self, cells: List[int]) -> int:
         """Decode a value to MLC cells
@@ -94,10 +133,78 @@ class MLCSim:
             int: Encoded value
         """
         self.checkCells(cells)
-        out = 0
+        if self.wide:
+            return self._decWide(cells)
+        return int(self.decArray(np.array([cells], dtype=np.uint8))[0])
+
+    def _encWide(self, val: int) -> List[int]:
+        # slow path for words over 64 bits
+        out: List[int] = []
         for d, cell in enumerate(self.config):
+            count = 0
             for i, bit in enumerate(cell):
-                out += bool(cells[d] & 2**i) * 2**bit
+                count += bool(val & 2**bit) << i
+            out.append(int(self.levels[d, count]))
+        return out
+
+    def _decWide(self, cells: List[int]) -> int:
+        # slow path for words over 64 bits
+        return sum(self.dec_table[d, cells[d]] for d in range(self.c))
+
+    def encArray(self, vals: np.ndarray) -> np.ndarray:
+        """Encode an array of values to MLC cells
+
+        Args:
+            vals (np.ndarray): Values to be encoded
+
+        Raises:
+            ValueError: If any value is too large
+
+        Returns:
+            np.ndarray: (len(vals), c) array of cell values
+        """
+        if self.wide:
+            return np.array(
+                [self.enc(int(val)) for val in np.asarray(vals).reshape(-1)],
+                dtype=np.uint8,
+            ).reshape(-1, self.c)
+
+        vals = np.asarray(vals, dtype=np.uint64).reshape(-1)
+        if self.L < 64 and len(vals) and vals.max() > 2**self.L - 1:
+            raise ValueError(f"Values are too large to store in {self.L} bits")
+        out = np.zeros((len(vals), self.c), dtype=np.uint8)
+        one = np.uint64(1)
+        for d, cell in enumerate(self.config):
+            for i, bit in enumerate(cell):
+                out[:, d] |= (((vals >> np.uint64(bit)) & one) << np.uint64(i)).astype(
+                    np.uint8
+                )
+            out[:, d] = self.levels[d][out[:, d]]
+        return out
+
+    def decArray(self, cells: np.ndarray) -> np.ndarray:
+        """Decode an array of MLC cells to values
+
+        Args:
+            cells (np.ndarray): (n, c) array of cell values
+
+        Raises:
+            ValueError: If any cell value is too large
+
+        Returns:
+            np.ndarray: Decoded values, uint64 or Python ints for words over 64 bits
+        """
+        cells = np.asarray(cells)
+        if cells.size and cells.max() > 2**self.b - 1:
+            raise ValueError(f"Cell value '{cells.max()}' is too large")
+        if self.wide:
+            return np.array(
+                [self._decWide(row) for row in cells.tolist()], dtype=object
+            )
+
+        out = np.zeros(len(cells), dtype=np.uint64)
+        for d in range(self.c):
+            out |= self.dec_table[d][cells[:, d]]
         return out
 
 
@@ -105,6 +212,7 @@ def _main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument("-f", required=True, help="cell config json")
+    parser.add_argument("-m", help="level mapping json")
     parser.add_argument(
         "action", choices=["enc", "dec"], help="action to take on value"
     )
@@ -115,7 +223,12 @@ def _main():
     with open(args.f, "r") as infile:
         config = json.load(infile)
 
-    mlc = MLCSim(config)
+    mappings = None
+    if args.m is not None:
+        with open(args.m, "r") as infile:
+            mappings = json.load(infile)
+
+    mlc = MLCSim(config, mappings)
 
     if args.action == "enc":
         print(mlc.enc(int(args.val)))
@@ -3,7 +3,8 @@
 """Cell configuration functions
 
 This module provides functions for finding/handling cell
-configurations.
+configurations, and the `Config` class, a compact hashable form of a
+cell configuration.
 
 When called directly as main, it outputs a list of the best
 and wost configs.
@@ -11,12 +12,13 @@ and wost configs.
 ```
 $ python -m mlcsim.cconfigs --help
 
-usage: cconfigs.py [-h] [-b {1,2,3,4}] [-c {1,2,3,4,5,6,7,8,9}] [-o O]
+usage: cconfigs.py [-h] [-b {1,2,3,4,5,6,7,8}]
+                   [-c {1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}] [-o O]
 
 options:
   -h, --help            show this help message and exit
-  -b {1,2,3,4}          bits per cell
-  -c {1,2,3,4,5,6,7,8,9}
+  -b {1,2,3,4,5,6,7,8}  bits per cell
+  -c {1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}
                         num of cells
   -o O                  output to file
 ```
@@ -28,7 +30,15 @@ from statistics import stdev
 from pprint import pprint
 import json
 from math import factorial
-from typing import Dict, Generator, List, Tuple, Union
+from typing import Dict, Generator, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    from progress import Progress  # type: ignore
+except ImportError:
+    from mlcsim.progress import Progress
+
 
 # https://stackoverflow.com/a/42304815/9047818
 def _part(
@@ -49,6 +59,112 @@ def _part(
                 yield result
 
 
+class Config:
+    __slots__ = ("masks", "b", "_hash")
+
+    def __init__(self, masks: Iterable[int], b: int):
+        """init Config
+
+        A cell configuration stored as one bit mask per cell, where bit `n`
+        of a mask is set if bit `n` of the value is stored in that cell. The
+        bits of a cell map to its levels in ascending order, which is the
+        form `findAllConfigs` generates.
+
+        Args:
+            masks (iterable): Bit mask of each cell
+            b (int): Bits per cell
+        """
+        self.masks: Tuple[int, ...] = tuple(masks)
+        self.b = b
+        self._hash = hash((self.masks, b))
+
+    @classmethod
+    def fromList(cls, config: List[List[int]]) -> "Config":
+        """Create a Config from a nested list
+
+        Args:
+            config (list): Cell configuration, i.e. [[0, 1], [2, 3]]
+
+        Raises:
+            ValueError: If the bits of a cell aren't in ascending order
+
+        Returns:
+            Config: The config
+        """
+        masks = []
+        for cell in config:
+            if list(cell) != sorted(cell):
+                raise ValueError(f"Cell {cell} is not in ascending order")
+            masks.append(sum(1 << bit for bit in cell))
+        return cls(masks, len(config[0]))
+
+    def toList(self) -> List[List[int]]:
+        """Convert back to a nested list
+
+        Returns:
+            list: Cell configuration
+        """
+        return [
+            [bit for bit in range(mask.bit_length()) if mask >> bit & 1]
+            for mask in self.masks
+        ]
+
+    def asArray(self) -> np.ndarray:
+        """Cell masks as an array
+
+        Returns:
+            np.ndarray: uint64 array of cell masks
+        """
+        return np.array(self.masks, dtype=np.uint64)
+
+    def canonical(self) -> "Config":
+        """The canonical form of the config
+
+        Reordering the cells of a config doesn't change which values are in
+        error, so configs which only differ in cell order share the same
+        canonical form.
+
+        Returns:
+            Config: The config with its cells sorted by mask
+        """
+        return Config(sorted(self.masks), self.b)
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Config):
+            return NotImplemented
+        return self._hash == other._hash and (self.masks, self.b) == (
+            other.masks,
+            other.b,
+        )
+
+    def __lt__(self, other: "Config") -> bool:
+        return (self.b, self.masks) < (other.b, other.masks)
+
+    def __repr__(self) -> str:
+        return f"Config({self.toList()})"
+
+
+def countConfigs(bits_per_cell: int, num_cells: int) -> int:
+    """Number of possible cell configurations, without listing them
+
+    Args:
+        bits_per_cell (int): Bits per cell
+        num_cells (int): Number of cells
+
+    Returns:
+        int: Number of configs `findAllConfigs` returns
+    """
+    return factorial(bits_per_cell * num_cells) // (
+        factorial(num_cells) * factorial(bits_per_cell) ** num_cells
+    )
+
+
 def findAllConfigs(bits_per_cell: int, num_cells: int) -> List[List[List[int]]]:
     """Calculates all possible cell configurations
 
@@ -59,9 +175,7 @@ def findAllConfigs(bits_per_cell: int, num_cells: int) -> List[List[List[int]]]:
     Returns:
         list: List of all possible cell configurations
     """
-    num_perms = factorial(bits_per_cell * num_cells) / (
-        factorial(num_cells) * factorial(bits_per_cell) ** num_cells
-    )
+    num_perms = countConfigs(bits_per_cell, num_cells)
 
     print(f"Calculating {num_perms} permutations...")
     if num_perms > 1e7:
@@ -79,7 +193,10 @@ def findAllConfigs(bits_per_cell: int, num_cells: int) -> List[List[List[int]]]:
 
 
 def sortConfigs(
-    b: int, c: int, error_map: List[List[float]]
+    b: int,
+    c: int,
+    error_map: List[List[float]],
+    progress: Optional[Progress] = None,
 ) -> List[Tuple[float, List[List[int]], float]]:
     """Generates all cell configs and sorts them by their delta and error sum
 
@@ -87,28 +204,43 @@ def sortConfigs(
         b (int): Bits per cell
         c (int): Number of cells
         error_map (dict): Error map dictionary
+        progress (Progress): Progress to report the scored configs to
 
     Returns:
         list: All configs sorted by delta and error sum
     """
     sums: List[Tuple[float, List[List[int]], float]] = []
 
-    for config in findAllConfigs(b, c):
-        config_steps: List[List[int]] = [calcCellDeltaList(cell) for cell in config]
+    # the same cells show up in many configs, so only score each cell once
+    cell_errs: Dict[Tuple[int, ...], float] = {}
 
+    configs = findAllConfigs(b, c)
+    if progress is not None:
+        progress.total = len(configs)
+
+    for n, config in enumerate(configs, 1):
         err_sum: float = 0
         errs: List[float] = []
-        for cell in config_steps:
-            l: List[float] = []
-            for i in range(2**b - 1):
-                l.append((error_map[i][1] + error_map[i + 1][0]) * cell[i])
-            s = sum(l)
+        for cell in config:
+            key = tuple(cell)
+            if key not in cell_errs:
+                steps = calcCellDeltaList(cell)
+                l: List[float] = []
+                for i in range(2**b - 1):
+                    l.append((error_map[i][1] + error_map[i + 1][0]) * steps[i])
+                cell_errs[key] = sum(l)
+            s = cell_errs[key]
             err_sum += s
             errs.append(s)
 
         sums.append((stdev(errs), config, err_sum))
+        if progress is not None and n % 4096 == 0:
+            progress.update(4096)
         # print()
 
+    if progress is not None:
+        progress.update(len(configs) % 4096)
+
     sums.sort()
     return sums
 
@@ -154,10 +286,10 @@ def _main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        "-b", type=int, default=2, choices=range(1, 5), help="bits per cell"
+        "-b", type=int, default=2, choices=range(1, 9), help="bits per cell"
     )
     parser.add_argument(
-        "-c", type=int, default=2, choices=range(1, 10), help="num of cells"
+        "-c", type=int, default=2, choices=range(1, 17), help="num of cells"
     )
     parser.add_argument("-o", type=str, help="output to file")
 
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""Client for the local warm-cache service
+
+This module provides a thin client for `mlcsim.server`. Its commands
+mirror the existing CLIs (`mlcsim.MLCSim`, `mlcsim.dist`, `mlcsim.steps`).
+
+```
+$ python -m mlcsim.client --help
+
+usage: client.py [-h] [--socket SOCKET] [--port PORT]
+                 {enc,dec,errmap,sort,stats,info} ...
+
+positional arguments:
+  {enc,dec,errmap,sort,stats,info}
+    enc                 encode a value (mlcsim.MLCSim enc)
+    dec                 decode a list of cells (mlcsim.MLCSim dec)
+    errmap              convert a threshold map to an error map (mlcsim.dist)
+    sort                rank all configs (mlcsim.steps)
+    stats               rank, stdev and error sum of one config
+    info                server cache statistics
+
+options:
+  -h, --help            show this help message and exit
+  --socket SOCKET       Unix socket path of the server
+  --port PORT           localhost TCP port of the server
+```
+"""
+
+import argparse
+import json
+import os
+import socket
+from ast import literal_eval
+from pprint import pprint
+from typing import Any, Dict, Optional
+
+try:
+    from server import DEFAULT_SOCKET  # type: ignore
+except ImportError:
+    from mlcsim.server import DEFAULT_SOCKET
+
+
+class MLCClient:
+    def __init__(self, path: Optional[str] = None, port: Optional[int] = None):
+        """init MLCClient
+
+        Args:
+            path (str): Unix socket path of the server (used if port is None)
+            port (int): Localhost TCP port of the server
+        """
+        if port is not None:
+            self.sock = socket.create_connection(("127.0.0.1", port))
+        else:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path or DEFAULT_SOCKET)
+        self.file = self.sock.makefile("rwb")
+
+    def request(self, cmd: str, **kwargs: Any) -> Any:
+        """Send a request and wait for its result
+
+        Args:
+            cmd (str): Command name
+            **kwargs: Command arguments
+
+        Raises:
+            RuntimeError: If the server reports an error
+
+        Returns:
+            any: Result of the command
+        """
+        kwargs["cmd"] = cmd
+        self.file.write(json.dumps(kwargs).encode() + b"\n")
+        self.file.flush()
+        resp: Dict[str, Any] = json.loads(self.file.readline())
+        if not resp["ok"]:
+            raise RuntimeError(resp["error"])
+        return resp["result"]
+
+    def close(self):
+        """Close the connection"""
+        self.file.close()
+        self.sock.close()
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help="Unix socket path of the server"
+    )
+    parser.add_argument("--port", type=int, help="localhost TCP port of the server")
+
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    for name, desc in [
+        ("enc", "encode a value (mlcsim.MLCSim enc)"),
+        ("dec", "decode a list of cells (mlcsim.MLCSim dec)"),
+    ]:
+        p = sub.add_parser(name, help=desc)
+        p.add_argument("-f", required=True, help="cell config json")
+        p.add_argument("val", help="val to {en,de}code")
+
+    p = sub.add_parser(
+        "errmap", help="convert a threshold map to an error map (mlcsim.dist)"
+    )
+    p.add_argument("-b", type=int, default=2, help="bits per cell")
+    p.add_argument("-f", required=True, help="Threshold map json to convert")
+    p.add_argument("-o", type=str, help="output to file")
+
+    p = sub.add_parser("sort", help="rank all configs (mlcsim.steps)")
+    p.add_argument("-b", type=int, default=2, help="bits per cell")
+    p.add_argument("-c", type=int, default=2, help="num of cells")
+    p.add_argument("--thr", required=True, help="Threshold map JSON")
+    p.add_argument("--top", type=int, help="only show the best TOP configs")
+
+    p = sub.add_parser("stats", help="rank, stdev and error sum of one config")
+    p.add_argument("-f", required=True, help="cell config json")
+    p.add_argument("--thr", required=True, help="Threshold map JSON")
+
+    sub.add_parser("info", help="server cache statistics")
+
+    args = parser.parse_args()
+
+    client = MLCClient(args.socket, args.port)
+    try:
+        if args.cmd in ("enc", "dec"):
+            val = int(args.val) if args.cmd == "enc" else literal_eval(args.val)
+            print(client.request(args.cmd, f=os.path.abspath(args.f), val=val))
+        elif args.cmd == "errmap":
+            err_map = client.request("errmap", thr=os.path.abspath(args.f), b=args.b)
+            if args.o:
+                with open(args.o, "w") as f:
+                    json.dump(err_map, f)
+            else:
+                pprint(err_map)
+        elif args.cmd == "sort":
+            sums = client.request(
+                "sort", thr=os.path.abspath(args.thr), b=args.b, c=args.c, top=args.top
+            )
+            width = len(str(sums[0][1]))
+            print(
+                "|",
+                "config".ljust(width + 2),
+                "|",
+                "stdev".rjust(12),
+                "|",
+                "sum * err".rjust(12),
+                "|",
+            )
+            print("|" + ("-" * (width + 4)) + "|" + ("-" * 14) + "|" + ("-" * 14) + "|")
+            for thing in sums:
+                print(f"| `{thing[1]}` | {thing[0]:10.10f} | {thing[2]:10.10f} |")
+        elif args.cmd == "stats":
+            res = client.request(
+                "stats", f=os.path.abspath(args.f), thr=os.path.abspath(args.thr)
+            )
+            print(
+                f"rank {res['rank'] + 1}/{res['of']}, "
+                f"stdev {res['stdev']:10.10f}, sum * err {res['err_sum']:10.10f}"
+            )
+        else:
+            pprint(client.request(args.cmd))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    _main()
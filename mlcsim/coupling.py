@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+
+"""Cell-to-cell interference
+
+This module provides fault injection where the error chances of a cell
+depend on the programmed levels of its neighbours, instead of every cell
+failing independently like in `mat.injectFaultsArray`.
+
+A block of cells is laid out like it is stored, with the cells of each
+value along a row and consecutive values in consecutive rows. Each
+neighbour shifts the read voltage of a cell up by its coupling coefficient
+times its level (as a fraction of the top level), so the shift of every
+cell is a 3x3 convolution of the block with a coupling kernel, done with
+one shifted add per kernel entry. The read thresholds stay at the
+midpoints of the threshold map, and the error map of every shift is looked
+up from a table computed once with `dist.readErrorMap`, so a coupled block
+only costs a few more array operations than an independent one.
+
+The row above and below a chunk come from the neighbouring chunks, so
+coupling across chunk boundaries is kept when streaming.
+"""
+
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+try:
+    from dist import readErrorMap, readThresholds  # type: ignore
+    from packed import PackedMatrix  # type: ignore
+except ImportError:
+    from mlcsim.dist import readErrorMap, readThresholds
+    from mlcsim.packed import PackedMatrix
+
+
+def couplingKernel(x: float, y: Optional[float] = None, xy: float = 0.0) -> np.ndarray:
+    """Coupling kernel of the neighbours of a cell
+
+    Args:
+        x (float): Coupling of the cells next to it in the same row
+        y (float): Coupling of the cells above and below it, defaults to x
+        xy (float): Coupling of the diagonal cells
+
+    Returns:
+        np.ndarray: (3, 3) kernel, indexed by row offset + 1 and column offset + 1
+    """
+    y = x if y is None else y
+    return np.array([[xy, y, xy], [x, 0.0, x], [xy, y, xy]])
+
+
+def neighborShift(
+    cells: np.ndarray,
+    kernel: np.ndarray,
+    levels: int,
+    above: Optional[np.ndarray] = None,
+    below: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Voltage shift of each cell caused by its neighbours
+
+    Args:
+        cells (np.ndarray): (n, c) array of cell levels
+        kernel (np.ndarray): (3, 3) coupling kernel
+        levels (int): Number of levels per cell
+        above (np.ndarray): (c,) levels of the row before the block, if any
+        below (np.ndarray): (c,) levels of the row after the block, if any
+
+    Returns:
+        np.ndarray: (n, c) array of shifts
+    """
+    n, c = cells.shape
+    # pad the block with a halo of neighbouring rows, or empty cells
+    pad = np.zeros((n + 2, c + 2))
+    pad[1:-1, 1:-1] = cells
+    if above is not None:
+        pad[0, 1:-1] = above
+    if below is not None:
+        pad[-1, 1:-1] = below
+    pad /= levels - 1
+
+    shift = np.zeros((n, c))
+    for dr, dc in zip(*np.nonzero(kernel)):
+        shift += kernel[dr, dc] * pad[dr : dr + n, dc : dc + c]
+    return shift
+
+
+def shiftedErrorMaps(
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    shifts: np.ndarray,
+    reads: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Error maps of levels shifted by some voltages
+
+    Args:
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+        shifts (np.ndarray): (s,) voltage shifts
+        reads (np.ndarray): Read thresholds, defaults to the midpoints of the threshold map
+
+    Returns:
+        np.ndarray: (s, levels, 2) error map of each shift
+    """
+    thr_map = np.asarray(thr_maps[str(bpc)], dtype=np.float64)
+    shifts = np.asarray(shifts, dtype=np.float64)[:, None]
+    means = thr_map[:, 0] + shifts
+    stds = np.broadcast_to(thr_map[:, 1], means.shape)
+    if reads is None:
+        reads = readThresholds(thr_maps, bpc)
+    return readErrorMap(means, stds, reads)
+
+
+def injectCoupledFaults(
+    cells: np.ndarray,
+    shift: np.ndarray,
+    table: np.ndarray,
+    step: float,
+    rng: np.random.Generator,
+) -> np.ndarray:
+    """Inject faults into an array of MLC cells with per-cell shifts
+
+    Args:
+        cells (np.ndarray): (n, c) array of clean cell values
+        shift (np.ndarray): (n, c) shift of each cell, from `neighborShift`
+        table (np.ndarray): (s, levels, 2) error maps from `shiftedErrorMaps`
+        step (float): Shift between consecutive error maps of the table
+        rng (np.random.Generator): Random number generator
+
+    Returns:
+        np.ndarray: New array of cell values with the faults injected
+    """
+    idx = np.clip(np.rint(shift / step), 0, len(table) - 1).astype(np.intp)
+    err = table[idx, cells]
+
+    rand = rng.random(cells.shape)
+    dn = rand < err[..., 0]
+    up = ~dn & (rand < err[..., 0] + err[..., 1])
+
+    out = cells.astype(np.int16)
+    out -= dn
+    out += up
+    return out.astype(cells.dtype)
+
+
+def coupledFaultChunks(
+    chunks: Iterable[Union[np.ndarray, PackedMatrix]],
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    kernel: np.ndarray,
+    rng: np.random.Generator,
+    reads: Optional[np.ndarray] = None,
+    bins: int = 256,
+) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+    """Inject coupled faults into each chunk of cell values
+
+    Chunks are read one ahead, so that the first row of the next chunk can
+    couple into the last row of the current one.
+
+    Args:
+        chunks (iterable): Chunks of clean cell values, arrays or `PackedMatrix`
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+        kernel (np.ndarray): (3, 3) coupling kernel, i.e. from `couplingKernel`
+        rng (np.random.Generator): Random number generator
+        reads (np.ndarray): Read thresholds, defaults to the midpoints of the threshold map
+        bins (int): Number of shifts in the error map table
+
+    Raises:
+        ValueError: If a coupling coefficient is negative
+
+    Yields:
+        tuple: Clean and dirty chunk
+    """
+    kernel = np.asarray(kernel, dtype=np.float64)
+    if (kernel < 0).any():
+        raise ValueError("Coupling coefficients must not be negative")
+    top = max(float(kernel.sum()), 1e-12)
+    step = top / (bins - 1)
+    table = shiftedErrorMaps(thr_maps, bpc, np.linspace(0, top, bins), reads)
+    levels = 2**bpc
+
+    # chunks of either type, narrowed by `packed` below
+    it: Iterator[Any] = iter(chunks)
+    cur = next(it, None)
+    above = None
+    while cur is not None:
+        nxt = next(it, None)
+        packed = isinstance(cur, PackedMatrix)
+        clean = cur.unpack() if packed else cur
+        below = None
+        if nxt is not None:
+            below = nxt.take(np.arange(1))[0] if packed else nxt[0]
+        shift = neighborShift(clean, kernel, levels, above, below)
+        dirty = injectCoupledFaults(clean, shift, table, step, rng)
+        if packed:
+            yield cur, PackedMatrix.pack(dirty, bpc)
+        else:
+            yield cur, dirty
+        above = clean[-1]
+        cur = nxt
@@ -11,13 +11,13 @@ into an error map.
 ```
 $ python -m mlcsim.dist --help
 
-usage: dist.py [-h] [-b {1,2,3,4}] -f F [-o O]
+usage: dist.py [-h] [-b {1,2,3,4,5,6,7,8}] -f F [-o O]
 
 options:
-  -h, --help    show this help message and exit
-  -b {1,2,3,4}  bits per cell
-  -f F          Threshold map json to convert
-  -o O          output to file
+  -h, --help            show this help message and exit
+  -b {1,2,3,4,5,6,7,8}  bits per cell
+  -f F                  Threshold map json to convert
+  -o O                  output to file
 ```
 """
 
@@ -52,7 +52,7 @@ def normalMidpoint(mean_a: float, mean_b: float, std_a: float, std_b: float) ->
     )
     roots = np.roots([a, b, c])
     masked = np.ma.masked_outside(roots, mean_a, mean_b)
-    return float(masked[~masked.mask][0][0])
+    return float(masked.compressed()[0])
 
 
 # https://www.askpython.com/python/normal-distribution
@@ -104,11 +104,62 @@ def genErrorMap(thr_maps: Dict[str, List[List[float]]], bpc: int) -> List[List[f
     return err_map
 
 
+def readThresholds(thr_maps: Dict[str, List[List[float]]], bpc: int) -> List[float]:
+    """Find the read thresholds of a threshold map
+
+    These are the midpoints between adjacent levels used by `genErrorMap`.
+
+    Args:
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+
+    Raises:
+        ValueError: if the given bpc is not in the threshold map
+
+    Returns:
+        list: Read threshold between each pair of adjacent levels
+    """
+    if str(bpc) not in thr_maps.keys():
+        raise ValueError(f"Threshold map does not have values for {bpc} levels")
+    thr_map = thr_maps[str(bpc)]
+    return [
+        normalMidpoint(
+            thr_map[i][0], thr_map[i + 1][0], thr_map[i][1], thr_map[i + 1][1]
+        )
+        for i in range(len(thr_map) - 1)
+    ]
+
+
+def readErrorMap(means: np.ndarray, stds: np.ndarray, reads: np.ndarray) -> np.ndarray:
+    """Generate error maps for level distributions read at fixed thresholds
+
+    Vectorized over any leading dimensions, so error maps for many sets of
+    level distributions (i.e. time steps) are computed at once.
+
+    Args:
+        means (np.ndarray): (..., levels) mean of each level
+        stds (np.ndarray): (..., levels) std dev of each level
+        reads (np.ndarray): (..., levels - 1) read thresholds
+
+    Returns:
+        np.ndarray: (..., levels, 2) chance of each level being read one level lower/higher
+    """
+    means = np.asarray(means, dtype=np.float64)
+    stds = np.asarray(stds, dtype=np.float64)
+    reads = np.asarray(reads, dtype=np.float64)
+
+    err_map = np.zeros(means.shape + (2,))
+    # below the threshold under the level / above the threshold over it
+    err_map[..., 1:, 0] = ss.norm.cdf(reads, means[..., 1:], stds[..., 1:])
+    err_map[..., :-1, 1] = ss.norm.sf(reads, means[..., :-1], stds[..., :-1])
+    return err_map
+
+
 def _main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        "-b", type=int, default=2, choices=range(1, 5), help="bits per cell"
+        "-b", type=int, default=2, choices=range(1, 9), help="bits per cell"
     )
     parser.add_argument("-f", required=True, help="Threshold map json to convert")
     parser.add_argument("-o", type=str, help="output to file")
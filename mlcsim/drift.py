@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+
+"""Retention drift simulation
+
+This module provides functions for simulating how errors build up in
+stored MLCs over time, as the level distributions of the cells drift.
+
+The read thresholds stay where they were placed at program time (the
+midpoints of the original threshold map), while each level's mean drifts
+down and its stdev widens every retention step. The error map of every
+step is computed at once with `dist.readErrorMap`. A matrix is stored once
+and then advanced step by step: cells which haven't failed yet fail with
+the extra chance added since the previous step, and failed cells stay
+failed, so each step only applies the incremental transition probabilities
+to the existing faulted state.
+
+When called directly as main, it prints the error statistics of each config
+after each retention step.
+
+```
+$ python -m mlcsim.drift --help
+
+usage: drift.py [-h] [-b {2,3,4,5,6,7,8}] [-c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}] [-f F]
+                [-n NUM_CONFIGS] --thr THR [--steps STEPS] [--shift SHIFT] [--widen WIDEN]
+                [--arr-size ARR_SIZE] [--chunk-size CHUNK_SIZE] [-o O]
+
+options:
+  -h, --help            show this help message and exit
+  -b {2,3,4,5,6,7,8}    bits per cell
+  -c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}
+                        num of cells
+  -f F                  config JSON
+  -n NUM_CONFIGS, --num-configs NUM_CONFIGS
+                        number of best and worst configs to test without -f
+  --thr THR             Threshold map JSON
+  --steps STEPS         number of retention steps
+  --shift SHIFT         mean shift of the top level per step
+  --widen WIDEN         relative stdev growth per step
+  --arr-size ARR_SIZE   number of values to store
+  --chunk-size CHUNK_SIZE
+                        values per chunk held in memory at once
+  -o O                  output per-step statistics to JSON
+```
+"""
+
+import argparse
+import json
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+try:
+    from cconfigs import sortConfigs  # type: ignore
+    from dist import readErrorMap, readThresholds  # type: ignore
+    from engine import ConfigEngine  # type: ignore
+    from mat import ErrStats, generateChunks, injectFaultsArray  # type: ignore
+except ImportError:
+    from mlcsim.cconfigs import sortConfigs
+    from mlcsim.dist import readErrorMap, readThresholds
+    from mlcsim.engine import ConfigEngine
+    from mlcsim.mat import ErrStats, generateChunks, injectFaultsArray
+
+
+def driftLevels(
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    steps: int,
+    shift: float,
+    widen: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Level distributions after each retention step
+
+    The mean of each level drifts down in proportion to its height above
+    the lowest level (charge loss), and every stdev widens linearly.
+
+    Args:
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+        steps (int): Number of retention steps
+        shift (float): Mean shift of the top level per step
+        widen (float): Relative stdev growth per step
+
+    Returns:
+        tuple: (steps + 1, levels) arrays of the means and stdevs, starting at program time
+    """
+    thr_map = np.asarray(thr_maps[str(bpc)], dtype=np.float64)
+    mean0, std0 = thr_map[:, 0], thr_map[:, 1]
+    t = np.arange(steps + 1)[:, None]
+    height = (mean0 - mean0[0]) / (mean0[-1] - mean0[0])
+    return mean0 - shift * t * height, std0 * (1 + widen * t)
+
+
+def driftErrorMaps(
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    steps: int,
+    shift: float,
+    widen: float,
+) -> np.ndarray:
+    """Cumulative error map after each retention step
+
+    Args:
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+        steps (int): Number of retention steps
+        shift (float): Mean shift of the top level per step
+        widen (float): Relative stdev growth per step
+
+    Returns:
+        np.ndarray: (steps + 1, levels, 2) error maps, starting at program time
+    """
+    means, stds = driftLevels(thr_maps, bpc, steps, shift, widen)
+    return readErrorMap(means, stds, readThresholds(thr_maps, bpc))
+
+
+def transitionMaps(err_maps: np.ndarray) -> np.ndarray:
+    """Incremental fault chances between retention steps
+
+    The chance that a cell which was still correct at the previous step
+    fails during this step, so that applying these to the surviving cells
+    step after step gives the cumulative error maps. Cells are assumed not
+    to recover once failed.
+
+    Args:
+        err_maps (np.ndarray): (steps + 1, levels, 2) cumulative error maps
+
+    Returns:
+        np.ndarray: (steps, levels, 2) transition error maps
+    """
+    prev = err_maps[:-1]
+    survive = 1 - prev.sum(axis=2, keepdims=True)
+    return np.clip(err_maps[1:] - prev, 0, None) / np.maximum(survive, 1e-300)
+
+
+def simulateDrift(
+    configs: List[List[List[int]]],
+    chunks: Iterable[np.ndarray],
+    err_maps: np.ndarray,
+    rng: np.random.Generator,
+) -> List[List[ErrStats]]:
+    """Store values once and advance them through retention steps
+
+    Args:
+        configs (list): Cell configurations
+        chunks (iterable): Chunks of clean cell values
+        err_maps (np.ndarray): (steps + 1, levels, 2) cumulative error maps
+        rng (np.random.Generator): Random number generator
+
+    Returns:
+        list: `ErrStats` of each config after each retention step
+    """
+    engine = ConfigEngine(configs)
+    trans = transitionMaps(err_maps)
+    stats = [engine.newStats() for _ in trans]
+
+    for clean in chunks:
+        # faults present right after programming, signed for the steps below
+        dirty = injectFaultsArray(clean, err_maps[0], rng).astype(np.int16)
+
+        for step, trans_map in enumerate(trans):
+            ok = dirty == clean
+            rand = rng.random(clean.shape)
+            t = trans_map[clean]
+            dn = ok & (rand < t[..., 0])
+            up = ok & ~dn & (rand < t[..., 0] + t[..., 1])
+            dirty += up.astype(np.int16) - dn
+            engine.update(clean, dirty.astype(clean.dtype), stats[step])
+
+    return [engine.results(s) for s in stats]
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-b", type=int, default=2, choices=range(2, 9), help="bits per cell"
+    )
+    parser.add_argument(
+        "-c", type=int, default=2, choices=range(2, 17), help="num of cells"
+    )
+    parser.add_argument("-f", help="config JSON")
+    parser.add_argument(
+        "-n",
+        "--num-configs",
+        type=int,
+        default=3,
+        help="number of best and worst configs to test without -f",
+    )
+    parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument(
+        "--steps", type=int, default=10, help="number of retention steps"
+    )
+    parser.add_argument(
+        "--shift",
+        type=float,
+        default=0.005,
+        help="mean shift of the top level per step",
+    )
+    parser.add_argument(
+        "--widen", type=float, default=0.05, help="relative stdev growth per step"
+    )
+    parser.add_argument(
+        "--arr-size", type=int, default=2**16, help="number of values to store"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=2**16,
+        help="values per chunk held in memory at once",
+    )
+    parser.add_argument("-o", type=str, help="output per-step statistics to JSON")
+
+    args = parser.parse_args()
+
+    b = args.b
+    c = args.c
+
+    with open(args.thr) as f:
+        thr_map = json.load(f)
+
+    err_maps = driftErrorMaps(thr_map, b, args.steps, args.shift, args.widen)
+
+    if args.f is not None:
+        print(f"Reading configs from file {args.f}")
+        with open(args.f, "r") as f:
+            configs = json.load(f)
+    else:
+        all_configs = sortConfigs(b, c, err_maps[0].tolist())
+        n = args.num_configs
+        if len(all_configs) > 2 * n:
+            configs = [all_configs[i][1] for i in range(n)] + [
+                all_configs[-i - 1][1] for i in range(n)
+            ]
+        else:
+            configs = [all_configs[i][1] for i in range(len(all_configs))]
+
+    print("Running simulations...")
+    rng = np.random.default_rng(0)
+    stats = simulateDrift(
+        configs,
+        generateChunks(b, c, args.arr_size, args.chunk_size, rng),
+        err_maps,
+        rng,
+    )
+
+    for i, config in enumerate(configs):
+        print(f"Config {i}: `{config}`")
+    print(f"{c} {b}-bit cells, {args.arr_size} numbers stored:")
+    print(
+        "| Step | Config | Error count | Error mean | Error Stdev | Error perc |\n|-|-|-|-|-|-|"
+    )
+    for step, step_stats in enumerate(stats):
+        for i, st in enumerate(step_stats):
+            print(
+                f"| {step + 1:4d} | {i} | {st.count:6d} | {st.mean:6.3f} | {st.stdev:6.3f} | {st.perc:7.3f}% |"
+            )
+
+    if args.o is not None:
+        with open(args.o, "w") as f:
+            json.dump(
+                {
+                    "configs": configs,
+                    "steps": [
+                        [
+                            {
+                                "count": st.count,
+                                "mean": st.mean,
+                                "stdev": st.stdev,
+                                "perc": st.perc,
+                            }
+                            for st in step_stats
+                        ]
+                        for step_stats in stats
+                    ],
+                },
+                f,
+            )
+
+
+if __name__ == "__main__":
+    _main()
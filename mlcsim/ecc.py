@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+"""Error correcting codes
+
+This module provides an ECC layer between decoding the cells of a word and
+accounting for its errors, so configs can be compared by the errors left
+after correction instead of the raw decoded errors.
+
+A code covers one MLC word or a group of consecutive words, as one
+codeword whose check bits are the top bits of the last word of the group
+(so which cells hold them depends on the config) and whose data bits are
+the rest. Codes are linear, so the syndrome of a faulted codeword is the
+syndrome of its error pattern, and only the error patterns (`clean ^ dirty`
+of the decoded words) are ever decoded. Syndromes are computed with one
+lookup per byte of the error pattern into precomputed tables, and a second
+table maps each syndrome to the bit to flip, so whole arrays of words are
+corrected at once.
+
+Codes are `Code` subclasses, registered by name in `CODES`.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+import numpy as np
+
+try:
+    from MLCSim import MLCSim  # type: ignore
+    from mat import ErrStats, absDiff  # type: ignore
+    from packed import PackedMatrix  # type: ignore
+    from progress import Progress  # type: ignore
+except ImportError:
+    from mlcsim.MLCSim import MLCSim
+    from mlcsim.mat import ErrStats, absDiff
+    from mlcsim.packed import PackedMatrix
+    from mlcsim.progress import Progress
+
+# syndrome table entries
+OK = -1
+DETECTED = -2
+
+
+class Code(ABC):
+    name = ""
+
+    def __init__(self, L: int, words: int = 1):
+        """init Code
+
+        Args:
+            L (int): Bits per MLC word
+            words (int): Number of words per codeword
+
+        Raises:
+            ValueError: If the words are wider than 64 bits, or the check bits don't fit in the last word
+        """
+        if L > 64:
+            raise ValueError(f"Codes over {L}-bit words are not supported")
+        self.L = L
+        self.words = words
+        self.n = L * words
+
+        columns = self.columns()
+        self.r = max(int(c).bit_length() for c in columns)
+        self.k = self.n - self.checkBits()
+        if self.n - self.k > L:
+            raise ValueError(f"{self.name} needs more check bits than a {L}-bit word")
+
+        # data bits of each word, the check bits are the top of the last word
+        self.data_mask = np.full(words, 2**L - 1, dtype=np.uint64)
+        self.data_mask[-1] = np.uint64(2 ** (self.k - L * (words - 1)) - 1)
+
+        # syndrome of each byte value of each byte lane of each word
+        lanes = -(-L // 8)
+        self.lanes = np.zeros((words, lanes, 256), dtype=np.int64)
+        byte = np.arange(256)
+        for pos, col in enumerate(columns):
+            word, bit = divmod(pos, L)
+            lane, shift = divmod(bit, 8)
+            self.lanes[word, lane, (byte >> shift) & 1 == 1] ^= col
+
+        self.fix = self.corrections(columns)
+
+    @abstractmethod
+    def checkBits(self) -> int:
+        """Number of check bits of the codeword
+
+        Returns:
+            int: Number of check bits
+        """
+
+    @abstractmethod
+    def columns(self) -> List[int]:
+        """Syndrome of a single error at each bit of the codeword
+
+        Returns:
+            list: Column of the parity check matrix of each bit
+        """
+
+    @abstractmethod
+    def corrections(self, columns: List[int]) -> np.ndarray:
+        """Bit to flip for each syndrome
+
+        Args:
+            columns (list): Columns from `columns`
+
+        Returns:
+            np.ndarray: (2**r,) bit position, `OK` or `DETECTED` of each syndrome
+        """
+
+    def syndromes(self, errs: np.ndarray) -> np.ndarray:
+        """Syndrome of each error pattern
+
+        Args:
+            errs (np.ndarray): (codewords, words) uint64 error patterns
+
+        Returns:
+            np.ndarray: (codewords,) syndromes
+        """
+        syn = np.zeros(len(errs), dtype=np.int64)
+        for word in range(self.words):
+            for lane in range(self.lanes.shape[1]):
+                byte = (errs[:, word] >> np.uint64(lane * 8)) & np.uint64(0xFF)
+                syn ^= self.lanes[word, lane][byte.astype(np.intp)]
+        return syn
+
+    def correct(self, errs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Correct error patterns
+
+        Args:
+            errs (np.ndarray): (codewords, words) uint64 error patterns
+
+        Returns:
+            tuple: Residual error patterns, and whether each codeword was flagged uncorrectable
+        """
+        fix = self.fix[self.syndromes(errs)]
+        out = errs.copy()
+        idx = np.flatnonzero(fix >= 0)
+        word, bit = np.divmod(fix[idx], self.L)
+        out[idx, word] ^= np.uint64(1) << bit.astype(np.uint64)
+        return out, fix == DETECTED
+
+
+class HammingSECDED(Code):
+    """Extended Hamming code, correcting single and detecting double bit errors"""
+
+    name = "secded"
+
+    def _m(self) -> int:
+        # smallest Hamming code with a column for every bit but the overall parity
+        m = 2
+        while 2**m < self.n:
+            m += 1
+        return m
+
+    def checkBits(self) -> int:
+        return self._m() + 1
+
+    def columns(self) -> List[int]:
+        m = self._m()
+        k = self.n - m - 1
+        overall = 1 << m
+        data = [v for v in range(1, 2**m) if v & (v - 1)][:k]
+        check = [1 << i for i in range(m)]
+        return [v | overall for v in data + check] + [overall]
+
+    def corrections(self, columns: List[int]) -> np.ndarray:
+        m = self._m()
+        fix = np.full(2 ** (m + 1), DETECTED, dtype=np.int64)
+        fix[0] = OK
+        for pos, col in enumerate(columns):
+            fix[col] = pos
+        return fix
+
+
+class Parity(Code):
+    """Single parity bit, detecting odd numbers of bit errors"""
+
+    name = "parity"
+
+    def checkBits(self) -> int:
+        return 1
+
+    def columns(self) -> List[int]:
+        return [1] * self.n
+
+    def corrections(self, columns: List[int]) -> np.ndarray:
+        return np.array([OK, DETECTED], dtype=np.int64)
+
+
+CODES: Dict[str, Type[Code]] = {code.name: code for code in (HammingSECDED, Parity)}
+
+
+class ECCStats:
+    def __init__(self, L: int):
+        """init ECCStats
+
+        Running statistics of the errors of one config before and after
+        correction.
+
+        Args:
+            L (int): Bits per value
+        """
+        self.raw = ErrStats(L)
+        self.residual = ErrStats(L)
+        self.faulted = 0
+        self.corrected = 0
+        self.detected = 0
+
+    @property
+    def silent(self) -> int:
+        """Codewords left in error without being flagged"""
+        return self.faulted - self.corrected - self.detected
+
+    def merge(self, other: "ECCStats"):
+        """Merge another accumulator into this one
+
+        Args:
+            other (ECCStats): Accumulator to merge
+        """
+        self.raw.merge(other.raw)
+        self.residual.merge(other.residual)
+        self.faulted += other.faulted
+        self.corrected += other.corrected
+        self.detected += other.detected
+
+
+def simulateECC(
+    configs: List[List[List[int]]],
+    code: Code,
+    pairs: Iterable[Tuple[np.ndarray, np.ndarray]],
+    progress: Optional[Progress] = None,
+) -> List[ECCStats]:
+    """Decode, correct and check faulted blocks with each config
+
+    Chunks must hold a whole number of codewords, except for the last one.
+
+    Args:
+        configs (list): Cell configurations
+        code (Code): Code over the decoded words
+        pairs (iterable): Clean and dirty blocks, i.e. from `mat.faultChunks`
+        progress (Progress): Progress to report the values and faults to
+
+    Returns:
+        list: `ECCStats` of each config
+    """
+    mlcs = [MLCSim(config) for config in configs]
+    stats = [ECCStats(mlc.L) for mlc in mlcs]
+
+    for clean, dirty in pairs:
+        if isinstance(clean, PackedMatrix):
+            rows = clean.diffRows(dirty)
+            clean_rows, dirty_rows = clean.take(rows), dirty.take(rows)
+        else:
+            rows = np.flatnonzero((clean != dirty).any(axis=1))
+            clean_rows, dirty_rows = clean[rows], dirty[rows]
+        groups, slot = np.unique(rows // code.words, return_inverse=True)
+        word = rows % code.words
+        mask = code.data_mask[word]
+
+        for mlc, stat in zip(mlcs, stats):
+            words = mlc.decArray(clean_rows)
+            err = words ^ mlc.decArray(dirty_rows)
+            errs = np.zeros((len(groups), code.words), dtype=np.uint64)
+            errs[slot, word] = err
+            residual, detected = code.correct(errs)
+            left = residual[slot, word]
+
+            data = words & mask
+            stat.raw.update(absDiff(data, (words ^ err) & mask), len(clean))
+            stat.residual.update(absDiff(data, (words ^ left) & mask), len(clean))
+            faulted = errs.any(axis=1)
+            stat.faulted += int(faulted.sum())
+            stat.corrected += int((faulted & ~residual.any(axis=1)).sum())
+            stat.detected += int((faulted & detected).sum())
+
+        if progress is not None:
+            progress.update(len(clean), faults=len(rows))
+
+    return stats
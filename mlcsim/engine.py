@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+
+"""Multi-config evaluation engine
+
+This module provides the `ConfigEngine` class, which evaluates many cell
+configurations against the same faulted blocks in one vectorized pass.
+
+The decode tables of all configs (the value contributed by each cell at
+each level, see `MLCSim.dec_table`) are stacked into one
+`(configs, cells, levels)` array, and configs with identical decode tables
+are only evaluated once. A value whose only fault is a single cell moving
+one level has an error magnitude which only depends on the cell and the
+level, so those faults are counted once per block and looked up for every
+config at the same time, instead of decoding the block again for each config.
+Values with several faulted cells are decoded explicitly, again for all
+configs at once.
+
+Decode tables are int64 for words of up to 63 bits, and uint64 for 64-bit
+words, whose errors are taken with `mat.absDiff` so nothing wraps. Wider
+words fall back to Python ints in object arrays, which is much slower.
+
+`simulateParallel` splits the random values between worker processes,
+which share the decode tables and error map of the engine through `shm`
+instead of each getting a pickled copy.
+"""
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from MLCSim import MLCSim  # type: ignore
+    from coupling import coupledFaultChunks  # type: ignore
+    from mat import ErrStats, absDiff, faultChunks, faultedRows, generateChunks  # type: ignore
+    from packed import generatePackedChunks  # type: ignore
+    from progress import Progress  # type: ignore
+    from shm import ArraySpec, SharedArrays, attachAll  # type: ignore
+except ImportError:
+    from mlcsim.MLCSim import MLCSim
+    from mlcsim.coupling import coupledFaultChunks
+    from mlcsim.mat import (
+        ErrStats,
+        absDiff,
+        faultChunks,
+        faultedRows,
+        generateChunks,
+    )
+    from mlcsim.packed import generatePackedChunks
+    from mlcsim.progress import Progress
+    from mlcsim.shm import ArraySpec, SharedArrays, attachAll
+
+
+def _uniqueTables(tables: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+    # only configs decoding every value the same are merged, in first-seen order
+    index: Dict[Any, int] = {}
+    inverse = [
+        index.setdefault(
+            table.tobytes() if table.dtype != object else tuple(table.flat), len(index)
+        )
+        for table in tables
+    ]
+    first = np.unique(inverse, return_index=True)[1]
+    return tables[first], inverse
+
+
+class ConfigEngine:
+    def __init__(self, configs: List[List[List[int]]]):
+        """init ConfigEngine
+
+        Args:
+            configs (list): Cell configurations, all with the same geometry
+        """
+        mlcs = [MLCSim(config) for config in configs]
+        self.configs = configs
+        self.b = mlcs[0].b
+        self.c = mlcs[0].c
+        self.L = mlcs[0].L
+        self.levels = 2**self.b
+
+        # (unique configs, cells, levels) decode tables
+        dtype: Any
+        if self.L < 64:
+            dtype = np.int64
+        elif self.L == 64:
+            dtype = np.uint64
+        else:
+            dtype = object
+        self.tables, self.inverse = _uniqueTables(
+            np.stack([mlc.dec_table for mlc in mlcs]).astype(dtype)
+        )
+        # (unique configs, cells * (levels - 1)) error of each single-level fault,
+        # binary tables ascend with the level so unsigned steps don't wrap
+        self.steps = np.abs(np.diff(self.tables, axis=2)).reshape(len(self.tables), -1)
+
+        self.stats = self.newStats()
+
+    @classmethod
+    def fromTables(
+        cls, tables: np.ndarray, inverse: List[int], steps: Optional[np.ndarray] = None
+    ) -> "ConfigEngine":
+        """Engine over decode tables built elsewhere, i.e. shared with `shm`
+
+        Args:
+            tables (np.ndarray): `tables` of another engine
+            inverse (list): `inverse` of the same engine
+            steps (np.ndarray): `steps` of the same engine, recomputed if not given
+
+        Returns:
+            ConfigEngine: Engine evaluating the same configs
+        """
+        engine = cls.__new__(cls)
+        engine.inverse = inverse
+        engine.configs = []
+        engine.c = tables.shape[1]
+        engine.levels = tables.shape[2]
+        engine.b = engine.levels.bit_length() - 1
+        engine.L = engine.b * engine.c
+        engine.tables = tables
+        if steps is None:
+            steps = np.abs(np.diff(tables, axis=2)).reshape(len(tables), -1)
+        engine.steps = steps
+        engine.stats = engine.newStats()
+        return engine
+
+    def errors(self, clean: np.ndarray, dirty: np.ndarray) -> np.ndarray:
+        """Error magnitudes of some rows for every unique config
+
+        Args:
+            clean (np.ndarray): (n, c) array of clean cell values
+            dirty (np.ndarray): (n, c) array of dirty cell values
+
+        Returns:
+            np.ndarray: (unique configs, n) array of error magnitudes
+        """
+        cells = np.arange(self.c)
+        if self.tables.dtype == np.uint64:
+            return absDiff(
+                self.tables[:, cells, dirty].sum(axis=2, dtype=np.uint64),
+                self.tables[:, cells, clean].sum(axis=2, dtype=np.uint64),
+            )
+        diff = self.tables[:, cells, dirty] - self.tables[:, cells, clean]
+        return np.abs(diff.sum(axis=2))
+
+    def update(self, clean, dirty, stats: Optional[List[ErrStats]] = None) -> int:
+        """Evaluate every config against a faulted block
+
+        Args:
+            clean (np.ndarray): Clean block, array or `PackedMatrix`
+            dirty (np.ndarray): Dirty block of the same type
+            stats (list): `ErrStats` of each unique config to update instead of the engine's own, see `newStats`
+
+        Returns:
+            int: Number of faulted values in the block
+        """
+        values = len(clean)
+        clean, dirty = faultedRows(clean, dirty)
+
+        faulted = clean != dirty
+        row_idx, cell_idx = np.nonzero(faulted)
+        per_row = np.bincount(row_idx, minlength=len(clean))
+        lo = np.minimum(clean, dirty)[row_idx, cell_idx].astype(np.int64)
+        hi = np.maximum(clean, dirty)[row_idx, cell_idx].astype(np.int64)
+
+        # rows with one fault of one level
+        single = (per_row[row_idx] == 1) & (hi - lo == 1)
+        keys = cell_idx[single] * (self.levels - 1) + lo[single]
+        counts = np.bincount(keys, minlength=self.steps.shape[1])
+        seen = np.flatnonzero(counts)
+        errs = self.steps[:, seen]
+        counts = counts[seen]
+
+        # everything else is decoded for all configs at once
+        multi = np.ones(len(clean), dtype=bool)
+        multi[row_idx[single]] = False
+        if multi.any():
+            errs = np.concatenate([errs, self.errors(clean[multi], dirty[multi])], 1)
+            counts = np.concatenate([counts, np.ones(multi.sum(), dtype=np.int64)])
+
+        for stat, err in zip(self.stats if stats is None else stats, errs):
+            stat.update(err, values, counts)
+        return len(clean)
+
+    def run(
+        self,
+        pairs: Iterable[Tuple[np.ndarray, np.ndarray]],
+        progress: Optional[Progress] = None,
+    ) -> List[ErrStats]:
+        """Evaluate every config against a stream of faulted blocks
+
+        Args:
+            pairs (iterable): Clean and dirty blocks, i.e. from `mat.faultChunks`
+            progress (Progress): Progress to report the values and faults to
+
+        Returns:
+            list: `ErrStats` of each config
+        """
+        for clean, dirty in pairs:
+            faults = self.update(clean, dirty)
+            if progress is not None:
+                progress.update(len(clean), faults=faults)
+        return self.results()
+
+    def newStats(self) -> List[ErrStats]:
+        """Empty statistics for each unique config
+
+        Returns:
+            list: `ErrStats` of each unique config
+        """
+        return [ErrStats(self.L) for _ in self.tables]
+
+    def results(self, stats: Optional[List[ErrStats]] = None) -> List[ErrStats]:
+        """Statistics of each config, in the order the configs were given
+
+        Args:
+            stats (list): `ErrStats` of each unique config to expand instead of the engine's own
+
+        Returns:
+            list: `ErrStats` of each config
+        """
+        # duplicates get their own copy, so merging results stays safe
+        used = set()
+        out: List[ErrStats] = []
+        stats = self.stats if stats is None else stats
+        for u in self.inverse:
+            out.append(copy.deepcopy(stats[u]) if u in used else stats[u])
+            used.add(u)
+        return out
+
+
+def _parallelWorker(
+    job: Tuple[Dict[str, ArraySpec], Dict[str, Any]],
+) -> Tuple[List[ErrStats], int, int]:
+    specs, opts = job
+    arrays = attachAll(specs)
+    engine = ConfigEngine.fromTables(
+        arrays["tables"], arrays["inverse"].tolist(), arrays["steps"]
+    )
+    rng = np.random.default_rng(opts["seed"])
+    gen = generatePackedChunks if opts["packed"] else generateChunks
+    chunks = gen(engine.b, engine.c, opts["values"], opts["chunk_size"], rng)
+    if opts["thr_maps"] is not None:
+        pairs = coupledFaultChunks(
+            chunks,
+            opts["thr_maps"],
+            engine.b,
+            arrays["kernel"],
+            rng,
+            arrays.get("reads"),
+        )
+    else:
+        pairs = faultChunks(chunks, arrays["error_map"], rng)
+    faults = 0
+    for clean, dirty in pairs:
+        faults += engine.update(clean, dirty)
+    return engine.stats, opts["values"], faults
+
+
+def simulateParallel(
+    configs: List[List[List[int]]],
+    error_map: List[List[float]],
+    values: int,
+    chunk_size: int,
+    jobs: int,
+    seed: int = 0,
+    packed: bool = False,
+    thr_maps: Optional[Dict[str, List[List[float]]]] = None,
+    kernel: Optional[np.ndarray] = None,
+    reads: Optional[np.ndarray] = None,
+    progress: Optional[Progress] = None,
+) -> List[ErrStats]:
+    """Evaluate configs against random faulted values in worker processes
+
+    The values are split into a few shares per worker, and each share is
+    generated and faulted from its own child of the seed, so the results
+    differ from a run in a single process. With a coupling kernel, cells only couple within a worker's
+    share.
+
+    Args:
+        configs (list): Cell configurations, all with the same geometry of at most 64 bits
+        error_map (list): Error map
+        values (int): Total number of values
+        chunk_size (int): Number of values per chunk
+        jobs (int): Number of worker processes
+        seed (int): Random seed
+        packed (bool): Whether to keep chunks as `PackedMatrix`
+        thr_maps (dict): Threshold map, to inject coupled faults with `kernel`
+        kernel (np.ndarray): Coupling kernel, see `coupling.couplingKernel`
+        reads (np.ndarray): Read thresholds of the coupled faults
+        progress (Progress): Progress to report each finished share to
+
+    Returns:
+        list: `ErrStats` of each config
+    """
+    engine = ConfigEngine(configs)
+    # a few shares per worker, so progress is reported while they run
+    per_job = -(-values // (4 * jobs) // chunk_size) * chunk_size
+    shares = [min(per_job, values - start) for start in range(0, values, per_job)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shares))
+
+    with SharedArrays() as shared:
+        shared.put("tables", engine.tables)
+        shared.put("steps", engine.steps)
+        shared.put("inverse", np.asarray(engine.inverse, dtype=np.int64))
+        shared.put("error_map", np.asarray(error_map, dtype=np.float64))
+        if kernel is not None:
+            shared.put("kernel", np.asarray(kernel, dtype=np.float64))
+        if reads is not None:
+            shared.put("reads", np.asarray(reads, dtype=np.float64))
+
+        work = [
+            (
+                shared.specs,
+                {
+                    "values": n,
+                    "chunk_size": chunk_size,
+                    "seed": s,
+                    "packed": packed,
+                    "thr_maps": thr_maps if kernel is not None else None,
+                },
+            )
+            for n, s in zip(shares, seeds)
+        ]
+        stats = engine.newStats()
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            for part, n, faults in ex.map(_parallelWorker, work):
+                for stat, other in zip(stats, part):
+                    stat.merge(other)
+                if progress is not None:
+                    progress.update(n, faults=faults)
+
+    return engine.results(stats)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+
+"""Threshold map fitting
+
+This module provides functions for fitting a threshold map to measured
+read levels, i.e. from chip characterization, instead of generating a
+synthetic one with `thresh.generateThresh`.
+
+Samples are (programmed level, read voltage) pairs, from CSV files with
+one pair per line or from binary files (`.npy` or raw) of pairs. Files are
+streamed in chunks, and the samples of each level are accumulated into a
+`LevelStats`, which keeps running counts, means and squared deviations
+that can be merged across chunks, files and processes, so any number of
+samples can be fitted in bounded memory. With `--jobs`, files (and
+segments of binary files) are fitted in parallel and merged at the end.
+
+When called directly as main, it outputs the fitted threshold map in the
+format `dist.genErrorMap` reads, and optionally the empirical confusion
+matrix of the samples read at the midpoints of the fitted map.
+
+```
+$ python -m mlcsim.fit --help
+
+usage: fit.py [-h] [-b B] [--dtype DTYPE] [--chunk-size CHUNK_SIZE] [--jobs JOBS]
+              [--confusion CONFUSION] [-o O]
+              files [files ...]
+
+positional arguments:
+  files                 CSV, .npy or raw binary files of (level, voltage) samples
+
+options:
+  -h, --help            show this help message and exit
+  -b B                  bits per cell, defaults to the highest level seen
+  --dtype DTYPE         dtype of the pairs in a raw binary file
+  --chunk-size CHUNK_SIZE
+                        samples per chunk held in memory at once
+  --jobs JOBS           number of worker processes
+  --confusion CONFUSION
+                        output the confusion matrix to JSON
+  -o O                  output the threshold map to JSON
+```
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pprint import pprint
+from typing import Dict, Generator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from dist import readThresholds  # type: ignore
+except ImportError:
+    from mlcsim.dist import readThresholds
+
+
+class LevelStats:
+    def __init__(self, levels: int = 0):
+        """init LevelStats
+
+        Running statistics of the read voltage of each level, which grow to
+        fit the highest level seen.
+
+        Args:
+            levels (int): Number of levels to start with
+        """
+        self.count = np.zeros(levels, dtype=np.int64)
+        self.mean = np.zeros(levels)
+        self.m2 = np.zeros(levels)
+
+    def _grow(self, levels: int):
+        if levels > len(self.count):
+            pad = levels - len(self.count)
+            self.count = np.concatenate([self.count, np.zeros(pad, dtype=np.int64)])
+            self.mean = np.concatenate([self.mean, np.zeros(pad)])
+            self.m2 = np.concatenate([self.m2, np.zeros(pad)])
+
+    def _combine(self, count: np.ndarray, mean: np.ndarray, m2: np.ndarray):
+        # Chan et al. parallel update, per level
+        self._grow(len(count))
+        n = len(count)
+        total = self.count[:n] + count
+        safe = np.maximum(total, 1)
+        delta = mean - self.mean[:n]
+        self.mean[:n] += delta * count / safe
+        self.m2[:n] += m2 + delta**2 * self.count[:n] * count / safe
+        self.count[:n] = total
+
+    def update(self, levels: np.ndarray, volts: np.ndarray):
+        """Add a chunk of samples
+
+        Args:
+            levels (np.ndarray): Programmed level of each sample
+            volts (np.ndarray): Read voltage of each sample
+
+        Raises:
+            ValueError: If a level is negative
+        """
+        levels = np.asarray(levels, dtype=np.int64)
+        volts = np.asarray(volts, dtype=np.float64)
+        if not len(levels):
+            return
+        if levels.min() < 0:
+            raise ValueError(f"Level '{levels.min()}' is negative")
+
+        count = np.bincount(levels)
+        mean = np.bincount(levels, volts) / np.maximum(count, 1)
+        m2 = np.bincount(levels, (volts - mean[levels]) ** 2)
+        self._combine(count, mean, m2)
+
+    def merge(self, other: "LevelStats"):
+        """Merge another accumulator into this one
+
+        Args:
+            other (LevelStats): Accumulator to merge
+        """
+        self._combine(other.count, other.mean, other.m2)
+
+    @property
+    def stdev(self) -> np.ndarray:
+        """Sample stdev of the read voltage of each level"""
+        return np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+
+    def thresholdMap(self, b: Optional[int] = None) -> Dict[str, List[List[float]]]:
+        """The fitted threshold map
+
+        Args:
+            b (int): Bits per cell, defaults to the fewest that fit every level seen
+
+        Raises:
+            ValueError: If a level has fewer than 2 samples
+
+        Returns:
+            dict: Threshold map with the mean and stdev of each level
+        """
+        if b is None:
+            b = max(int(np.ceil(np.log2(max(len(self.count), 2)))), 1)
+        self._grow(2**b)
+        sparse = np.flatnonzero(self.count[: 2**b] < 2)
+        if len(sparse):
+            raise ValueError(f"Levels {sparse.tolist()} have fewer than 2 samples")
+        return {
+            str(b): [
+                [float(mean), float(std)]
+                for mean, std in zip(self.mean[: 2**b], self.stdev[: 2**b])
+            ]
+        }
+
+
+def _readCSV(path: str, chunk_size: int) -> Generator[np.ndarray, None, None]:
+    # read whole lines in blocks of bytes, parsed with numpy's C parser
+    block = chunk_size * 16
+    rest = b""
+    header = True
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(block)
+            if not data:
+                break
+            data = rest + data
+            cut = data.rfind(b"\n") + 1
+            data, rest = data[:cut], data[cut:]
+            if header:
+                header = False
+                first, _, body = data.partition(b"\n")
+                try:
+                    [float(x) for x in first.split(b",")]
+                except ValueError:
+                    data = body
+            yield _parseCSV(data)
+    if rest.strip():
+        yield _parseCSV(rest)
+
+
+def _parseCSV(data: bytes) -> np.ndarray:
+    text = data.replace(b"\r", b"").replace(b"\n", b",").decode()
+    return np.fromstring(text.strip(","), sep=",").reshape(-1, 2)
+
+
+def _openBinary(path: str, dtype: str) -> np.ndarray:
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+    else:
+        data = np.memmap(path, dtype=dtype, mode="r")
+    if data.dtype.names:
+        return data
+    return data.reshape(-1, 2)
+
+
+def readSamples(
+    path: str,
+    dtype: str = "float32",
+    chunk_size: int = 2**20,
+    start: int = 0,
+    stop: Optional[int] = None,
+) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+    """Stream (level, voltage) samples out of a file
+
+    CSV files have one `level,voltage` pair per line, with an optional
+    header. Binary files are memory-mapped, either as `(n, 2)` arrays of
+    pairs or `.npy` record arrays with `level` and `volt` fields.
+
+    Args:
+        path (str): Path to a CSV, `.npy` or raw binary file
+        dtype (str): dtype of the pairs in a raw binary file
+        chunk_size (int): Number of samples per chunk
+        start (int): First sample to read of a binary file
+        stop (int): Sample to stop before in a binary file, defaults to the end
+
+    Yields:
+        tuple: Chunk of levels and chunk of voltages
+    """
+    if path.endswith(".csv"):
+        for pairs in _readCSV(path, chunk_size):
+            yield pairs[:, 0].astype(np.int64), pairs[:, 1]
+        return
+
+    data = _openBinary(path, dtype)
+    stop = len(data) if stop is None else stop
+    for i in range(start, stop, chunk_size):
+        chunk = data[i : min(i + chunk_size, stop)]
+        if data.dtype.names:
+            yield chunk["level"].astype(np.int64), chunk["volt"].astype(np.float64)
+        else:
+            yield chunk[:, 0].astype(np.int64), chunk[:, 1].astype(np.float64)
+
+
+def _segments(path: str, dtype: str, parts: int) -> List[Tuple[int, Optional[int]]]:
+    # CSV files can't be split on sample boundaries without reading them
+    if path.endswith(".csv") or parts <= 1:
+        return [(0, None)]
+    n = len(_openBinary(path, dtype))
+    bounds = np.linspace(0, n, parts + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def _fitWorker(job: Tuple[str, str, int, int, Optional[int]]) -> LevelStats:
+    path, dtype, chunk_size, start, stop = job
+    stats = LevelStats()
+    for levels, volts in readSamples(path, dtype, chunk_size, start, stop):
+        stats.update(levels, volts)
+    return stats
+
+
+def _confusionWorker(
+    job: Tuple[str, str, int, int, Optional[int], List[float]],
+) -> np.ndarray:
+    path, dtype, chunk_size, start, stop, reads = job
+    levels = len(reads) + 1
+    out = np.zeros((levels, levels), dtype=np.int64)
+    for level, volts in readSamples(path, dtype, chunk_size, start, stop):
+        read = np.searchsorted(reads, volts)
+        keys = level * levels + read
+        out += np.bincount(keys[level < levels], minlength=levels**2).reshape(
+            levels, levels
+        )
+    return out
+
+
+def _jobs(
+    paths: List[str], dtype: str, chunk_size: int, jobs: int
+) -> List[Tuple[str, str, int, int, Optional[int]]]:
+    parts = max(jobs // max(len(paths), 1), 1)
+    return [
+        (path, dtype, chunk_size, start, stop)
+        for path in paths
+        for start, stop in _segments(path, dtype, parts)
+    ]
+
+
+def fitThresholds(
+    paths: List[str],
+    dtype: str = "float32",
+    chunk_size: int = 2**20,
+    jobs: int = 1,
+) -> LevelStats:
+    """Fit the level statistics of some sample files
+
+    Args:
+        paths (list): Paths to CSV, `.npy` or raw binary files
+        dtype (str): dtype of the pairs in raw binary files
+        chunk_size (int): Number of samples per chunk
+        jobs (int): Number of worker processes
+
+    Returns:
+        LevelStats: Merged statistics of every file
+    """
+    work = _jobs(paths, dtype, chunk_size, jobs)
+    stats = LevelStats()
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            for part in ex.map(_fitWorker, work):
+                stats.merge(part)
+    else:
+        for job in work:
+            stats.merge(_fitWorker(job))
+    return stats
+
+
+def confusionMatrix(
+    paths: List[str],
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    dtype: str = "float32",
+    chunk_size: int = 2**20,
+    jobs: int = 1,
+) -> np.ndarray:
+    """Empirical confusion matrix of some sample files
+
+    Samples are read at the midpoints of the threshold map.
+
+    Args:
+        paths (list): Paths to CSV, `.npy` or raw binary files
+        thr_maps (dict): Threshold map, i.e. from `LevelStats.thresholdMap`
+        bpc (int): Bits per cell
+        dtype (str): dtype of the pairs in raw binary files
+        chunk_size (int): Number of samples per chunk
+        jobs (int): Number of worker processes
+
+    Returns:
+        np.ndarray: (levels, levels) chance of each programmed level being read as each level
+    """
+    reads = readThresholds(thr_maps, bpc)
+    work = [job + (reads,) for job in _jobs(paths, dtype, chunk_size, jobs)]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            counts = np.sum(list(ex.map(_confusionWorker, work)), axis=0)
+    else:
+        counts = np.sum([_confusionWorker(job) for job in work], axis=0)
+    return counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "files",
+        nargs="+",
+        help="CSV, .npy or raw binary files of (level, voltage) samples",
+    )
+    parser.add_argument(
+        "-b", type=int, help="bits per cell, defaults to the highest level seen"
+    )
+    parser.add_argument(
+        "--dtype", default="float32", help="dtype of the pairs in a raw binary file"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=2**20,
+        help="samples per chunk held in memory at once",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(), help="number of worker processes"
+    )
+    parser.add_argument("--confusion", help="output the confusion matrix to JSON")
+    parser.add_argument("-o", type=str, help="output the threshold map to JSON")
+
+    args = parser.parse_args()
+
+    stats = fitThresholds(args.files, args.dtype, args.chunk_size, args.jobs)
+    thr_map = stats.thresholdMap(args.b)
+    bpc = int(next(iter(thr_map)))
+    print(f"Fitted {bpc}-bit levels from {int(stats.count.sum())} samples")
+
+    if args.o:
+        with open(args.o, "w") as f:
+            json.dump(thr_map, f)
+    else:
+        pprint(thr_map)
+
+    if args.confusion:
+        confusion = confusionMatrix(
+            args.files, thr_map, bpc, args.dtype, args.chunk_size, args.jobs
+        )
+        with open(args.confusion, "w") as f:
+            json.dump(confusion.tolist(), f)
+
+
+if __name__ == "__main__":
+    _main()
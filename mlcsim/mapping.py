@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+"""Level mapping search
+
+This module provides functions for searching over the mapping between the
+bits of a cell and its levels, jointly with the cell configuration.
+
+A mapping lists the code (the cell's bits, read as a binary number in
+ascending bit order) stored at each level, so `[0, 1, 2, 3]` is plain
+binary and `[0, 1, 3, 2]` is Gray code. The error sum of a config is
+separable per cell, and the error sum of a cell only depends on its bits
+and its mapping,
+
+    sum_i w_i * |v(m[i + 1]) - v(m[i])|
+
+where `w_i` is the chance of an error between levels `i` and `i + 1` and
+`v(code)` is the value the code stands for. All candidate mappings of all
+distinct cells are scored at once as one array operation, and each cell
+of a config then takes its best mapping.
+
+Mappings whose codes are all complemented give the same steps, and so do
+reversed mappings when the error weights are symmetric, so only one
+mapping of each such group is scored. For up to 3 bits per cell every
+permutation of the codes is searched; beyond that, the candidates are the
+binary and Gray codes with their code bits permuted and flipped.
+
+When called directly as main, it prints the best configs with their
+mappings.
+
+```
+$ python -m mlcsim.mapping --help
+
+usage: mapping.py [-h] [-b {1,2,3,4}] [-c {1,2,3,4,5,6,7,8,9}] --thr THR [--top TOP] [-o O]
+
+options:
+  -h, --help            show this help message and exit
+  -b {1,2,3,4}          bits per cell
+  -c {1,2,3,4,5,6,7,8,9}
+                        num of cells
+  --thr THR             Threshold map JSON
+  --top TOP             number of configs to report
+  -o O                  output best configs and mappings to file
+```
+"""
+
+import argparse
+import json
+from itertools import permutations
+from statistics import stdev
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from cconfigs import findAllConfigs  # type: ignore
+    from dist import genErrorMap  # type: ignore
+except ImportError:
+    from mlcsim.cconfigs import findAllConfigs
+    from mlcsim.dist import genErrorMap
+
+
+def binaryCode(b: int) -> List[int]:
+    """Plain binary mapping
+
+    Args:
+        b (int): Bits per cell
+
+    Returns:
+        list: Code stored at each level
+    """
+    return list(range(2**b))
+
+
+def grayCode(b: int) -> List[int]:
+    """Reflected Gray code mapping
+
+    Args:
+        b (int): Bits per cell
+
+    Returns:
+        list: Code stored at each level
+    """
+    return [i ^ (i >> 1) for i in range(2**b)]
+
+
+def stepWeights(error_map: List[List[float]], b: int) -> np.ndarray:
+    """Chance of an error between each pair of adjacent levels
+
+    Args:
+        error_map (list): Error map
+        b (int): Bits per cell
+
+    Returns:
+        np.ndarray: (2**b - 1,) array of step weights
+    """
+    err = np.asarray(error_map, dtype=np.float64)[: 2**b]
+    return err[:-1, 1] + err[1:, 0]
+
+
+def canonicalMapping(
+    mapping: Sequence[int], symmetric: bool = False
+) -> Tuple[int, ...]:
+    """The canonical form of a mapping
+
+    Complementing every code of a mapping (or reversing it, when the step
+    weights are symmetric) doesn't change its error sum, so mappings which
+    only differ by those share the same canonical form.
+
+    Args:
+        mapping (list): Code stored at each level
+        symmetric (bool): Whether the step weights are symmetric
+
+    Returns:
+        tuple: The smallest equivalent mapping
+    """
+    full = len(mapping) - 1
+    forms = [tuple(mapping), tuple(m ^ full for m in mapping)]
+    if symmetric:
+        forms += [f[::-1] for f in forms]
+    return min(forms)
+
+
+def candidateMappings(b: int, symmetric: bool = False) -> np.ndarray:
+    """All mappings to search, one per group of equivalent mappings
+
+    Args:
+        b (int): Bits per cell
+        symmetric (bool): Whether the step weights are symmetric
+
+    Returns:
+        np.ndarray: (mappings, 2**b) array of codes stored at each level
+    """
+    if b <= 3:
+        found = {canonicalMapping(p, symmetric) for p in permutations(range(2**b))}
+    else:
+        found = set()
+        for base in (binaryCode(b), grayCode(b)):
+            for order in permutations(range(b)):
+                # move code bit k to position order[k]
+                moved = [
+                    sum((code >> k & 1) << pos for k, pos in enumerate(order))
+                    for code in base
+                ]
+                for flip in range(2**b):
+                    mapping = [code ^ flip for code in moved]
+                    found.add(canonicalMapping(mapping, symmetric))
+    return np.array(sorted(found), dtype=np.int64)
+
+
+def cellValues(cell: List[int]) -> np.ndarray:
+    """Value each code of a cell stands for
+
+    Args:
+        cell (list): List of bits in a cell (i.e. [0, 1, 2, 3])
+
+    Returns:
+        np.ndarray: (2**b,) array of values, indexed by code
+    """
+    codes = np.arange(2 ** len(cell))
+    return sum(((codes >> i) & 1) * 2**bit for i, bit in enumerate(cell))
+
+
+def mappingScores(
+    cells: List[List[int]], mappings: np.ndarray, weights: np.ndarray
+) -> np.ndarray:
+    """Error sum of every cell under every mapping
+
+    Args:
+        cells (list): Cells to score
+        mappings (np.ndarray): (mappings, 2**b) array from `candidateMappings`
+        weights (np.ndarray): Step weights from `stepWeights`
+
+    Returns:
+        np.ndarray: (cells, mappings) array of error sums
+    """
+    vals = np.stack([cellValues(cell) for cell in cells]).astype(np.float64)
+    steps = np.abs(np.diff(vals[:, mappings], axis=2))
+    return steps @ weights
+
+
+def sortMappedConfigs(
+    b: int, c: int, error_map: List[List[float]]
+) -> List[Tuple[float, List[List[int]], float, List[List[int]]]]:
+    """Generates all cell configs with their best mappings and sorts them
+
+    Each cell takes the mapping with the lowest error sum, then configs are
+    sorted by the stdev and the sum of their cell error sums, the same as
+    `cconfigs.sortConfigs`.
+
+    Args:
+        b (int): Bits per cell
+        c (int): Number of cells
+        error_map (list): Error map
+
+    Returns:
+        list: All configs as (stdev, config, err_sum, mappings), sorted by stdev and error sum
+    """
+    weights = stepWeights(error_map, b)
+    # weights are tiny probabilities, so only compare them relative to each other
+    symmetric = bool(np.allclose(weights, weights[::-1], rtol=1e-12, atol=0))
+    mappings = candidateMappings(b, symmetric)
+    configs = findAllConfigs(b, c)
+
+    # every distinct cell is scored once, against every mapping at once
+    index: Dict[Tuple[int, ...], int] = {}
+    for config in configs:
+        for cell in config:
+            index.setdefault(tuple(cell), len(index))
+    scores = mappingScores([list(cell) for cell in index], mappings, weights)
+    best = scores.argmin(axis=1)
+    cell_errs = scores[np.arange(len(index)), best].tolist()
+    best_maps = mappings[best].tolist()
+
+    sums: List[Tuple[float, List[List[int]], float, List[List[int]]]] = []
+    for config in configs:
+        idx = [index[tuple(cell)] for cell in config]
+        errs = [cell_errs[i] for i in idx]
+        sums.append(
+            (
+                stdev(errs) if c > 1 else 0.0,
+                config,
+                sum(errs),
+                [best_maps[i] for i in idx],
+            )
+        )
+
+    sums.sort()
+    return sums
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-b", type=int, default=2, choices=range(1, 5), help="bits per cell"
+    )
+    parser.add_argument(
+        "-c", type=int, default=2, choices=range(1, 10), help="num of cells"
+    )
+    parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of configs to report"
+    )
+    parser.add_argument("-o", type=str, help="output best configs and mappings to file")
+
+    args = parser.parse_args()
+
+    with open(args.thr) as f:
+        thr_map = json.load(f)
+    error_map = genErrorMap(thr_map, args.b)
+
+    sums = sortMappedConfigs(args.b, args.c, error_map)[: args.top]
+
+    print("| config | mappings | stdev | sum * err |\n|-|-|-|-|")
+    for thing in sums:
+        print(
+            f"| `{thing[1]}` | `{thing[3]}` | {thing[0]:10.10f} | {thing[2]:10.10f} |"
+        )
+
+    if args.o is not None:
+        with open(args.o, "w") as outfile:
+            json.dump(
+                [{"config": thing[1], "mappings": thing[3]} for thing in sums], outfile
+            )
+
+
+if __name__ == "__main__":
+    _main()
@@ -3,15 +3,38 @@
 """Matrix functions
 
 This module provides functions for creating and handling matrix applications.
+
+Alongside the list-of-lists functions, it provides NumPy versions that work
+on whole `(n, c)` arrays of cell levels, a reader that streams words out of
+`.npy` or raw binary files through memory-mapped I/O, and `ErrStats` for
+accumulating error statistics chunk by chunk.
+
+The chunked functions are generator stages which can be chained, and fed
+to `engine.ConfigEngine` for decoding and accumulation, so that only one
+chunk is ever held at a time:
+
+```
+chunks = generateChunks(b, c, 2**30, 2**16, rng)
+stats = ConfigEngine(configs).run(faultChunks(chunks, error_map, rng))
+```
+
+The chunks can also be `packed.PackedMatrix` instances, which are faulted
+in their packed form and only unpacked for the rows holding a fault.
 """
 
 import random
-from typing import List
+from typing import Generator, Iterable, List, Optional, Tuple
+
+import numpy as np
 
 try:
     from MLCSim import MLCSim  # type: ignore
+    from packed import PackedMatrix  # type: ignore
+    from progress import Progress  # type: ignore
 except ImportError:
     from mlcsim.MLCSim import MLCSim
+    from mlcsim.packed import PackedMatrix
+    from mlcsim.progress import Progress
 
 
 def generateMatrix(b: int, c: int, arr_size: int) -> List[List[int]]:
@@ -90,3 +113,275 @@ def calcErrMagnitude(
                 # print(f'Config {config_i}: should be {int(dec_i)} is {dec_o}')
                 errs[config_idx].append(abs(dec_o - dec_i))
                 errs_perc[config_idx].append(abs(dec_o - dec_i) / 2 ** (mlc.b * mlc.c))
+
+
+def injectFaultsArray(
+    cells: np.ndarray,
+    error_map: List[List[float]],
+    rng: Optional[np.random.Generator],
+    rand: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Inject faults into an array of MLC cells
+
+    Args:
+        cells (np.ndarray): (n, c) array of clean cell values
+        error_map (list): Error map
+        rng (np.random.Generator): Random number generator
+        rand (np.ndarray): (n, c) uniforms to fault the cells with instead of drawing them from rng
+
+    Returns:
+        np.ndarray: New array of cell values with the faults injected
+    """
+    err_map = np.asarray(error_map, dtype=np.float64)
+    err_prob_l = err_map[:, 0][cells]
+    err_prob_h = err_map[:, 1][cells]
+
+    if rand is None:
+        rand = rng.random(cells.shape)  # type: ignore
+    dn = rand < err_prob_l
+    up = ~dn & (rand < err_prob_l + err_prob_h)
+
+    out = cells.astype(np.int16)
+    out -= dn
+    out += up
+    return out.astype(cells.dtype)
+
+
+def generateChunks(
+    b: int, c: int, arr_size: int, chunk_size: int, rng: np.random.Generator
+) -> Generator[np.ndarray, None, None]:
+    """Generates a matrix of random cell values chunk by chunk
+
+    Args:
+        b (int): Bits per cell
+        c (int): Number of cells
+        arr_size (int): Total number of values
+        chunk_size (int): Number of values per chunk
+        rng (np.random.Generator): Random number generator
+
+    Yields:
+        np.ndarray: (chunk_size, c) array of cell values, the last chunk may be smaller
+    """
+    for start in range(0, arr_size, chunk_size):
+        n = min(chunk_size, arr_size - start)
+        yield rng.integers(0, 2**b, size=(n, c), dtype=np.uint8)
+
+
+def faultChunks(
+    chunks: Iterable[np.ndarray],
+    error_map: List[List[float]],
+    rng: np.random.Generator,
+) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+    """Inject faults into each chunk of cell values
+
+    Args:
+        chunks (iterable): Chunks of clean cell values, arrays or `PackedMatrix`
+        error_map (list): Error map
+        rng (np.random.Generator): Random number generator
+
+    Yields:
+        tuple: Clean and dirty chunk
+    """
+    for clean in chunks:
+        if isinstance(clean, PackedMatrix):
+            yield clean, clean.injectFaults(error_map, rng)[0]
+        else:
+            yield clean, injectFaultsArray(clean, error_map, rng)
+
+
+def faultedRows(clean, dirty) -> Tuple[np.ndarray, np.ndarray]:
+    """Extract the rows holding a fault from a clean and dirty chunk
+
+    Args:
+        clean (np.ndarray): Clean chunk, array or `PackedMatrix`
+        dirty (np.ndarray): Dirty chunk of the same type
+
+    Returns:
+        tuple: (nf, c) arrays of the clean and dirty cell values of the faulted rows
+    """
+    if isinstance(clean, PackedMatrix):
+        rows = clean.diffRows(dirty)
+        return clean.take(rows), dirty.take(rows)
+    rows = (clean != dirty).any(axis=1)
+    return clean[rows], dirty[rows]
+
+
+def absDiff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Absolute difference of two unsigned arrays without wrapping around
+
+    Args:
+        a (np.ndarray): First array
+        b (np.ndarray): Second array
+
+    Returns:
+        np.ndarray: |a - b|
+    """
+    return np.where(a > b, a - b, b - a)
+
+
+def _openWords(path: str, dtype: Optional[str]) -> np.ndarray:
+    # memory-map a .npy or raw file as a flat array
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+    else:
+        data = np.memmap(path, dtype=dtype or "uint8", mode="r")
+    return data.reshape(-1)
+
+
+def wordBits(path: str, dtype: Optional[str] = None) -> int:
+    """Width of the words of a `.npy` or raw binary file, without reading them
+
+    Args:
+        path (str): Path to a `.npy` or raw binary file
+        dtype (str): Word dtype of a raw file (ignored for `.npy`)
+
+    Returns:
+        int: Bits per word
+    """
+    return _openWords(path, dtype).dtype.itemsize * 8
+
+
+def readWords(
+    path: str, dtype: Optional[str] = None, chunk_size: int = 2**16
+) -> Generator[np.ndarray, None, None]:
+    """Stream words out of a `.npy` or raw binary file
+
+    The file is memory-mapped and read `chunk_size` words at a time, so
+    files larger than RAM can be processed in bounded memory. Words are
+    reinterpreted as unsigned integers of the same width.
+
+    Args:
+        path (str): Path to a `.npy` or raw binary file
+        dtype (str): Word dtype of a raw file (ignored for `.npy`)
+        chunk_size (int): Number of words per chunk
+
+    Yields:
+        np.ndarray: Chunk of words as a uint64 array
+    """
+    data = _openWords(path, dtype)
+    unsigned = np.dtype(f"u{data.dtype.itemsize}")
+
+    for start in range(0, len(data), chunk_size):
+        chunk = np.ascontiguousarray(data[start : start + chunk_size])
+        yield chunk.view(unsigned).astype(np.uint64)
+
+
+def simulateWords(
+    configs: List[List[List[int]]],
+    chunks: Iterable[np.ndarray],
+    error_map: List[List[float]],
+    rng: np.random.Generator,
+    progress: Optional[Progress] = None,
+) -> List["ErrStats"]:
+    """Encode, inject faults into and decode real data with each config
+
+    Args:
+        configs (list): Cell configurations
+        chunks (iterable): Chunks of words, i.e. from `readWords`
+        error_map (list): Error map
+        rng (np.random.Generator): Random number generator
+        progress (Progress): Progress to report the words to
+
+    Returns:
+        list: `ErrStats` of each config
+    """
+    mlcs = [MLCSim(config) for config in configs]
+    stats = [ErrStats(mlc.L) for mlc in mlcs]
+
+    for words in chunks:
+        for mlc, stat in zip(mlcs, stats):
+            dirty = injectFaultsArray(mlc.encArray(words), error_map, rng)
+            stat.update(absDiff(mlc.decArray(dirty), words))
+        if progress is not None:
+            progress.update(len(words))
+
+    return stats
+
+
+class ErrStats:
+    def __init__(self, L: int, bins: int = 20):
+        """init ErrStats
+
+        Running statistics of the error magnitudes seen for one config,
+        merged chunk by chunk so that the errors never need to be kept.
+
+        Args:
+            L (int): Bits per value
+            bins (int): Number of histogram bins over the percentage error
+        """
+        self.L = L
+        self.values = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.max = 0.0
+        self.hist = np.zeros(bins, dtype=np.int64)
+
+    def update(
+        self,
+        errs: np.ndarray,
+        values: Optional[int] = None,
+        counts: Optional[np.ndarray] = None,
+    ):
+        """Add a chunk of error magnitudes
+
+        Args:
+            errs (np.ndarray): Error magnitudes, zeros are counted as error-free values
+            values (int): Number of values checked, if errs only holds some of them
+            counts (np.ndarray): Number of times each error magnitude was seen, defaults to once
+        """
+        errs = np.asarray(errs, dtype=np.float64)
+        if counts is None:
+            counts = np.ones(len(errs), dtype=np.int64)
+        self.values += int(counts.sum()) if values is None else values
+        nonzero = (errs != 0) & (counts != 0)
+        errs = errs[nonzero]
+        counts = counts[nonzero]
+        if len(errs) == 0:
+            return
+
+        other = ErrStats(self.L, len(self.hist))
+        other.count = int(counts.sum())
+        other.mean = float((errs * counts).sum() / other.count)
+        other.m2 = float((counts * (errs - other.mean) ** 2).sum())
+        other.max = float(errs.max())
+        bins = (errs / 2.0**self.L * len(self.hist)).astype(np.int64)
+        other.hist = np.bincount(
+            np.minimum(bins, len(self.hist) - 1),
+            weights=counts,
+            minlength=len(self.hist),
+        ).astype(np.int64)
+        self.merge(other, values=0)
+
+    def merge(self, other: "ErrStats", values: Optional[int] = None):
+        """Merge another accumulator into this one
+
+        Args:
+            other (ErrStats): Accumulator to merge
+            values (int): Number of values to add instead of other.values
+        """
+        self.values += other.values if values is None else values
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta**2 * self.count * other.count / count
+        self.count = count
+        self.max = max(self.max, other.max)
+        self.hist += other.hist
+
+    @property
+    def stdev(self) -> float:
+        """Sample stdev of the error magnitudes"""
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else float("nan")
+
+    @property
+    def total(self) -> float:
+        """Sum of the error magnitudes"""
+        return self.mean * self.count
+
+    @property
+    def perc(self) -> float:
+        """Mean error magnitude as a percentage of 2**L"""
+        return self.mean / 2**self.L * 100 if self.count else float("nan")
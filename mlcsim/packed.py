@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+"""Packed cell matrix
+
+This module provides the `PackedMatrix` class, a compact representation of
+an `(n, c)` matrix of cell levels which stores several cells per byte
+(eight 1-bit, four 2-bit or two 4-bit slots, or one 5- to 8-bit cell per
+byte), along with fault injection that works directly on the packed bytes.
+
+Compared to a list of lists of Python ints, this takes 1/8 to 1 byte per
+cell instead of dozens of bytes, which cuts memory and memory bandwidth
+for large arrays by well over an order of magnitude.
+"""
+
+from typing import Generator, List, Tuple
+
+import numpy as np
+
+
+def slotWidth(b: int) -> int:
+    """Number of bits used to store a cell with b bits
+
+    Args:
+        b (int): Bits per cell
+
+    Raises:
+        ValueError: If b is too large to pack
+
+    Returns:
+        int: Slot width in bits
+    """
+    for width in (1, 2, 4, 8):
+        if b <= width:
+            return width
+    raise ValueError(f"Can't pack {b}-bit cells")
+
+
+class PackedMatrix:
+    def __init__(self, data: np.ndarray, b: int, c: int, n: int):
+        """init PackedMatrix
+
+        Args:
+            data (np.ndarray): uint8 array of packed cell levels, row-major
+            b (int): Bits per cell
+            c (int): Number of cells per value
+            n (int): Number of values
+        """
+        self.data = data
+        self.b = b
+        self.c = c
+        self.n = n
+        self.width = slotWidth(b)
+        self.per_byte = 8 // self.width
+        self.mask = np.uint8(2**self.width - 1)
+
+    def __len__(self) -> int:
+        return self.n
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the packed cells"""
+        return self.data.nbytes
+
+    @classmethod
+    def pack(cls, cells: np.ndarray, b: int) -> "PackedMatrix":
+        """Pack a matrix of cell levels
+
+        Args:
+            cells (np.ndarray): (n, c) array of cell levels
+            b (int): Bits per cell
+
+        Returns:
+            PackedMatrix: Packed matrix
+        """
+        n, c = cells.shape
+        width = slotWidth(b)
+        per_byte = 8 // width
+        flat = np.zeros(-(-n * c // per_byte) * per_byte, dtype=np.uint8)
+        flat[: n * c] = cells.reshape(-1)
+        slots = flat.reshape(-1, per_byte)
+
+        data = np.zeros(len(slots), dtype=np.uint8)
+        for s in range(per_byte):
+            data |= slots[:, s] << np.uint8(s * width)
+        return cls(data, b, c, n)
+
+    @classmethod
+    def random(cls, b: int, c: int, n: int, rng: np.random.Generator) -> "PackedMatrix":
+        """Generate a packed matrix of uniformly random cell levels
+
+        Random bytes are masked down to b bits per slot, so the cells are
+        never unpacked.
+
+        Args:
+            b (int): Bits per cell
+            c (int): Number of cells per value
+            n (int): Number of values
+            rng (np.random.Generator): Random number generator
+
+        Returns:
+            PackedMatrix: Packed matrix
+        """
+        width = slotWidth(b)
+        per_byte = 8 // width
+        nbytes = -(-n * c // per_byte)
+
+        level_mask = 0
+        for s in range(per_byte):
+            level_mask |= (2**b - 1) << (s * width)
+        data = rng.integers(0, 256, nbytes, dtype=np.uint8) & np.uint8(level_mask)
+
+        # clear the padding slots of the last byte
+        pad = nbytes * per_byte - n * c
+        if pad:
+            data[-1] &= np.uint8(2 ** ((per_byte - pad) * width) - 1)
+        return cls(data, b, c, n)
+
+    def unpack(self) -> np.ndarray:
+        """Unpack to a matrix of cell levels
+
+        Returns:
+            np.ndarray: (n, c) uint8 array of cell levels
+        """
+        slots = np.empty((len(self.data), self.per_byte), dtype=np.uint8)
+        for s in range(self.per_byte):
+            slots[:, s] = (self.data >> np.uint8(s * self.width)) & self.mask
+        return slots.reshape(-1)[: self.n * self.c].reshape(self.n, self.c)
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """Unpack only some rows
+
+        Args:
+            rows (np.ndarray): Row indices
+
+        Returns:
+            np.ndarray: (len(rows), c) uint8 array of cell levels
+        """
+        idx = np.asarray(rows, dtype=np.int64)[:, None] * self.c + np.arange(self.c)
+        shift = ((idx % self.per_byte) * self.width).astype(np.uint8)
+        return (self.data[idx // self.per_byte] >> shift) & self.mask
+
+    def diffRows(self, other: "PackedMatrix") -> np.ndarray:
+        """Find the rows that differ from another packed matrix
+
+        Args:
+            other (PackedMatrix): Matrix of the same shape
+
+        Returns:
+            np.ndarray: Sorted indices of the differing rows
+        """
+        diff = self.data ^ other.data
+        byte_idx = np.flatnonzero(diff)
+        slots: List[np.ndarray] = []
+        for s in range(self.per_byte):
+            hit = (diff[byte_idx] >> np.uint8(s * self.width)) & self.mask
+            slots.append(byte_idx[hit != 0] * self.per_byte + s)
+        return np.unique(np.concatenate(slots) // self.c)
+
+    def injectFaults(
+        self, error_map: List[List[float]], rng: np.random.Generator
+    ) -> Tuple["PackedMatrix", int]:
+        """Inject faults into the packed cells
+
+        Each slot is extracted with a shift and mask, faulted with the same
+        rules as `mat.injectFaultsArray` and written back, one slot position
+        of every byte at a time.
+
+        Args:
+            error_map (list): Error map
+            rng (np.random.Generator): Random number generator
+
+        Returns:
+            tuple: New packed matrix with the faults injected, and the number of faults
+        """
+        err_map = np.zeros((2**self.width, 2), dtype=np.float64)
+        err_map[: len(error_map)] = error_map
+        err_prob_l = err_map[:, 0]
+        err_prob_lh = err_map[:, 0] + err_map[:, 1]
+
+        # padding slots of the last byte must stay empty
+        valid = self.n * self.c - (len(self.data) - 1) * self.per_byte
+
+        out = np.zeros_like(self.data)
+        err_count = 0
+        for s in range(self.per_byte):
+            shift = np.uint8(s * self.width)
+            level = (self.data >> shift) & self.mask
+            rand = rng.random(len(level))
+            if s >= valid:
+                rand[-1] = 1.0
+            dn = rand < err_prob_l[level]
+            up = ~dn & (rand < err_prob_lh[level])
+            err_count += int(dn.sum() + up.sum())
+            level = level - dn.astype(np.uint8) + up.astype(np.uint8)
+            out |= level << shift
+
+        return PackedMatrix(out, self.b, self.c, self.n), err_count
+
+
+def generatePackedChunks(
+    b: int, c: int, arr_size: int, chunk_size: int, rng: np.random.Generator
+) -> Generator[PackedMatrix, None, None]:
+    """Generates packed matrices of random cell values chunk by chunk
+
+    Args:
+        b (int): Bits per cell
+        c (int): Number of cells
+        arr_size (int): Total number of values
+        chunk_size (int): Number of values per chunk
+        rng (np.random.Generator): Random number generator
+
+    Yields:
+        PackedMatrix: Packed chunk, the last chunk may be smaller
+    """
+    for start in range(0, arr_size, chunk_size):
+        yield PackedMatrix.random(b, c, min(chunk_size, arr_size - start), rng)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+
+"""Progress reporting
+
+This module provides the `Progress` class, which long runs (simulations,
+config ranking) update as they go, and which reports their throughput,
+counters, elapsed time and ETA at most once per interval.
+
+Reports go to the terminal as one status line on stderr, so the results
+printed on stdout are left alone, and/or as JSON lines to a stream, one
+object per report, for schedulers to follow:
+
+    {"task": "simulate", "time": 1700000000.0, "elapsed": 12.0, "done": 1048576,
+     "total": 4194304, "unit": "values", "rate": 87381.3, "eta": 36.0,
+     "faults": 1210, "faults_rate": 100.8, "finished": false, ...}
+
+The last report of a task has `"finished": true`. Any extra keyword given
+to `Progress` (i.e. the geometry or the number of configs) is included in
+every JSON report.
+"""
+
+import json
+import sys
+import time
+from typing import Any, Dict, Optional, TextIO
+
+
+def _clock(seconds: float) -> str:
+    # format a duration as h:mm:ss
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _count(n: float) -> str:
+    # format a count with a metric suffix
+    for suffix in ("", "k", "M", "G"):
+        if abs(n) < 1000:
+            return f"{n:.4g}{suffix}"
+        n /= 1000
+    return f"{n:.4g}T"
+
+
+def openStream(path: Optional[str]) -> Optional[TextIO]:
+    """Open a JSON-lines progress stream
+
+    Args:
+        path (str): Output path, `-` for stdout, or None for no stream
+
+    Returns:
+        TextIO: Line-buffered stream, or None
+    """
+    if path is None:
+        return None
+    if path == "-":
+        return sys.stdout
+    return open(path, "w", buffering=1)
+
+
+class Progress:
+    def __init__(
+        self,
+        task: str,
+        total: Optional[int] = None,
+        unit: str = "values",
+        terminal: bool = True,
+        stream: Optional[TextIO] = None,
+        interval: float = 1.0,
+        **info: Any,
+    ):
+        """init Progress
+
+        Args:
+            task (str): Name of the task being reported
+            total (int): Total amount of work in `unit`, if known
+            unit (str): Unit of the work done
+            terminal (bool): Whether to show a status line on stderr
+            stream (TextIO): Stream to write JSON lines to, i.e. from `openStream`
+            interval (float): Least number of seconds between reports
+            info: Extra fields of every JSON report
+        """
+        self.task = task
+        self.total = total
+        self.unit = unit
+        self.terminal = terminal
+        self.stream = stream
+        self.interval = interval
+        self.info = info
+
+        self.done = 0
+        self.counters: Dict[str, int] = {}
+        self.start = time.monotonic()
+        self._last = self.start
+
+    def __enter__(self) -> "Progress":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the task started"""
+        return time.monotonic() - self.start
+
+    def update(self, n: int = 0, **counters: int):
+        """Add some work done, and report if the interval has passed
+
+        Args:
+            n (int): Work done in `unit`
+            counters: Amounts to add to other counters, i.e. faults=12
+        """
+        self.done += n
+        for key, val in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + int(val)
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.report()
+
+    def record(self, finished: bool = False) -> Dict[str, Any]:
+        """Current state of the task
+
+        Args:
+            finished (bool): Whether the task is over
+
+        Returns:
+            dict: JSON report
+        """
+        elapsed = self.elapsed
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.done, 0) / rate
+        rec: Dict[str, Any] = {
+            "task": self.task,
+            "time": time.time(),
+            "elapsed": elapsed,
+            "done": self.done,
+            "total": self.total,
+            "unit": self.unit,
+            "rate": rate,
+            "eta": 0.0 if finished else eta,
+        }
+        for key, val in self.counters.items():
+            rec[key] = val
+            rec[f"{key}_rate"] = val / elapsed if elapsed > 0 else 0.0
+        rec["finished"] = finished
+        rec.update(self.info)
+        return rec
+
+    def report(self, finished: bool = False):
+        """Report the current state to the terminal and stream
+
+        Args:
+            finished (bool): Whether the task is over
+        """
+        rec = self.record(finished)
+        if self.stream is not None:
+            self.stream.write(json.dumps(rec) + "\n")
+            self.stream.flush()
+        if self.terminal:
+            done = _count(self.done)
+            if self.total:
+                done += f"/{_count(self.total)} ({100 * self.done / self.total:.0f}%)"
+            line = (
+                f"{self.task}: {done} {self.unit}, {_count(rec['rate'])} {self.unit}/s"
+            )
+            for key, val in self.counters.items():
+                line += f", {_count(val)} {key}"
+            line += f", {_clock(rec['elapsed'])} elapsed"
+            if rec["eta"] is not None and not finished:
+                line += f", ETA {_clock(rec['eta'])}"
+            if sys.stderr.isatty():
+                # redraw one status line in place
+                sys.stderr.write(f"\r\033[K{line}" + ("\n" if finished else ""))
+            else:
+                sys.stderr.write(line + "\n")
+            sys.stderr.flush()
+
+    def close(self):
+        """Report the final state of the task"""
+        self.report(finished=True)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+"""Read threshold optimization
+
+This module provides functions for placing the read thresholds of a
+threshold map to minimize the expected decoded error magnitude of a cell
+configuration, instead of at the equal-density midpoints used by
+`dist.genErrorMap`.
+
+A level `j` is read as level `k` when it lands between thresholds `k - 1`
+and `k`, which costs `C[k, j] = sum_d |v_d[k] - v_d[j]| ** power` summed
+over the cells `d` of the config, where `v_d` is the value each level of
+the cell decodes to (`MLCSim.dec_table`). Moving threshold `k` only moves
+values between reading `k` and `k + 1`, so the expected cost splits into
+one term per threshold,
+
+    F_k(t) = sum_j p_j * (C[k, j] - C[k + 1, j]) * Phi_j(t)
+
+with `p_j` the prior of level `j` and `Phi_j` its CDF, which includes every
+level and not just the adjacent ones. Each `F_k` is minimized on a grid
+between the means of its two levels and refined with a parabola through
+the best grid point, for all thresholds of all configs at once.
+
+For plain binary cells and `power=1`, `C[k, j] - C[k + 1, j]` is the same
+step size for every `j` on one side of the threshold, so the step sizes
+cancel and every config gets the same thresholds. Configs with level
+mappings (see `mapping`) or ranked by squared error (`power=2`) do get
+thresholds of their own. Configs whose costs only differ by a scale share
+their thresholds, and are only optimized once.
+
+When called directly as main, it prints the optimized thresholds and error
+maps of some configs.
+
+```
+$ python -m mlcsim.reads --help
+
+usage: reads.py [-h] [-b {1,2,3,4,5,6,7,8}] -f F [-m M] --thr THR [--power POWER] [-o O]
+
+options:
+  -h, --help            show this help message and exit
+  -b {1,2,3,4,5,6,7,8}  bits per cell
+  -f F                  config JSON
+  -m M                  level mappings JSON, one list per config
+  --thr THR             Threshold map JSON
+  --power POWER         exponent of the error magnitude to minimize
+  -o O                  output error maps to file
+```
+"""
+
+import argparse
+import json
+from statistics import stdev
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import stats as ss  # type: ignore
+
+try:
+    from MLCSim import MLCSim  # type: ignore
+    from dist import readErrorMap, readThresholds  # type: ignore
+except ImportError:
+    from mlcsim.MLCSim import MLCSim
+    from mlcsim.dist import readErrorMap, readThresholds
+
+
+def costMatrices(tables: np.ndarray, power: float = 1) -> np.ndarray:
+    """Cost of reading each level as each other level
+
+    Args:
+        tables (np.ndarray): (configs, cells, levels) decode tables
+        power (float): Exponent of the error magnitude
+
+    Returns:
+        np.ndarray: (configs, levels read, levels stored) array of costs
+    """
+    tables = np.asarray(tables, dtype=np.float64)
+    diff = np.abs(tables[:, :, :, None] - tables[:, :, None, :])
+    return (diff**power).sum(axis=1)
+
+
+def optimalReads(
+    costs: np.ndarray,
+    means: np.ndarray,
+    stds: np.ndarray,
+    priors: Optional[np.ndarray] = None,
+    grid: int = 256,
+) -> np.ndarray:
+    """Read thresholds minimizing the expected cost
+
+    Args:
+        costs (np.ndarray): (configs, levels, levels) arrays from `costMatrices`
+        means (np.ndarray): (levels,) mean of each level
+        stds (np.ndarray): (levels,) std dev of each level
+        priors (np.ndarray): (levels,) chance of storing each level, defaults to uniform
+        grid (int): Number of candidate thresholds between each pair of levels
+
+    Returns:
+        np.ndarray: (configs, levels - 1) read thresholds
+    """
+    means = np.asarray(means, dtype=np.float64)
+    stds = np.asarray(stds, dtype=np.float64)
+    levels = len(means)
+    if priors is None:
+        priors = np.full(levels, 1 / levels)
+
+    # (configs, thresholds, levels) weight of each level's CDF in F_k
+    weights = (costs[:, :-1, :] - costs[:, 1:, :]) * priors
+
+    # configs whose weights only differ by a scale share their thresholds
+    scale = np.abs(weights).max(axis=2, keepdims=True)
+    norm = np.round(weights / np.where(scale > 0, scale, 1), 12)
+    unique, inverse = np.unique(norm, axis=0, return_inverse=True)
+
+    # (thresholds, grid) candidates, and (thresholds, grid, levels) CDFs
+    frac = np.linspace(0, 1, grid)
+    cands = means[:-1, None] + (means[1:] - means[:-1])[:, None] * frac
+    cdfs = ss.norm.cdf(cands[..., None], means, stds)
+
+    # (unique, thresholds, grid) expected cost of each candidate
+    cost = np.einsum("ukj,kgj->ukg", unique, cdfs)
+    best = np.clip(cost.argmin(axis=2), 1, grid - 2)
+
+    # refine with the vertex of the parabola through the neighbours
+    u_idx, k_idx = np.indices(best.shape)
+    lo, mid, hi = (cost[u_idx, k_idx, best + d] for d in (-1, 0, 1))
+    curve = lo - 2 * mid + hi
+    offset = np.where(curve > 0, 0.5 * (lo - hi) / np.where(curve > 0, curve, 1), 0)
+    pos = best + np.clip(offset, -1, 1)
+    reads = means[:-1] + (means[1:] - means[:-1]) * pos / (grid - 1)
+
+    return reads[inverse.reshape(-1)]
+
+
+def optimalErrorMaps(
+    configs: List[List[List[int]]],
+    thr_maps: Dict[str, List[List[float]]],
+    bpc: int,
+    mappings: Optional[List[List[List[int]]]] = None,
+    priors: Optional[np.ndarray] = None,
+    power: float = 1,
+    batch: int = 4096,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Optimize the read thresholds of each config and generate its error map
+
+    Args:
+        configs (list): Cell configurations
+        thr_maps (dict): Threshold map
+        bpc (int): Bits per cell
+        mappings (list): Level mappings of each config, defaults to binary
+        priors (np.ndarray): (levels,) chance of storing each level, defaults to uniform
+        power (float): Exponent of the error magnitude
+        batch (int): Most configs optimized at once, lowered for many levels to bound memory
+
+    Raises:
+        ValueError: if the given bpc is not in the threshold map
+
+    Returns:
+        tuple: (configs, levels - 1) read thresholds, and (configs, levels, 2) error maps
+    """
+    if str(bpc) not in thr_maps.keys():
+        raise ValueError(f"Threshold map does not have values for {bpc} levels")
+    thr_map = np.asarray(thr_maps[str(bpc)], dtype=np.float64)
+    means, stds = thr_map[:, 0], thr_map[:, 1]
+
+    if mappings is None:
+        mappings = [None] * len(configs)  # type: ignore
+
+    # the cost matrices take (batch, cells, levels, levels) floats
+    batch = max(1, min(batch, 2**22 // (len(configs[0]) * len(means) ** 2)))
+    reads = np.empty((len(configs), len(means) - 1))
+    for start in range(0, len(configs), batch):
+        tables = np.stack(
+            [
+                MLCSim(config, mapping).dec_table
+                for config, mapping in zip(
+                    configs[start : start + batch], mappings[start : start + batch]  # type: ignore
+                )
+            ]
+        )
+        reads[start : start + batch] = optimalReads(
+            costMatrices(tables, power), means, stds, priors
+        )
+
+    shape = (len(configs), len(means))
+    err_maps = readErrorMap(
+        np.broadcast_to(means, shape), np.broadcast_to(stds, shape), reads
+    )
+    return reads, err_maps
+
+
+def rankConfigs(
+    configs: List[List[List[int]]],
+    error_maps: np.ndarray,
+    mappings: Optional[List[List[List[int]]]] = None,
+) -> List[Tuple[float, List[List[int]], float]]:
+    """Sort configs which each have their own error map
+
+    Configs are scored the same way as `cconfigs.sortConfigs`.
+
+    Args:
+        configs (list): Cell configurations
+        error_maps (np.ndarray): (configs, levels, 2) error map of each config
+        mappings (list): Level mappings of each config, defaults to binary
+
+    Returns:
+        list: All configs sorted by delta and error sum
+    """
+    if mappings is None:
+        mappings = [None] * len(configs)  # type: ignore
+    sums: List[Tuple[float, List[List[int]], float]] = []
+    for config, mapping, err in zip(configs, mappings, error_maps):  # type: ignore
+        table = MLCSim(config, mapping).dec_table.astype(np.float64)
+        weights = err[:-1, 1] + err[1:, 0]
+        errs = (np.abs(np.diff(table, axis=1)) @ weights).tolist()
+        sums.append((stdev(errs), config, sum(errs)))
+    sums.sort()
+    return sums
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-b", type=int, default=2, choices=range(1, 9), help="bits per cell"
+    )
+    parser.add_argument("-f", required=True, help="config JSON")
+    parser.add_argument("-m", help="level mappings JSON, one list per config")
+    parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument(
+        "--power",
+        type=float,
+        default=1,
+        help="exponent of the error magnitude to minimize",
+    )
+    parser.add_argument("-o", type=str, help="output error maps to file")
+
+    args = parser.parse_args()
+
+    with open(args.thr) as f:
+        thr_map = json.load(f)
+    with open(args.f) as f:
+        configs = json.load(f)
+    mappings = None
+    if args.m is not None:
+        with open(args.m) as f:
+            mappings = json.load(f)
+
+    reads, err_maps = optimalErrorMaps(
+        configs, thr_map, args.b, mappings, power=args.power
+    )
+
+    print(f"Midpoints: {np.round(readThresholds(thr_map, args.b), 4).tolist()}")
+    print("| Config | Read thresholds |\n|-|-|")
+    for config, read in zip(configs, reads):
+        print(f"| `{config}` | {np.round(read, 4).tolist()} |")
+
+    if args.o is not None:
+        with open(args.o, "w") as f:
+            json.dump(err_maps.tolist(), f)
+
+
+if __name__ == "__main__":
+    _main()
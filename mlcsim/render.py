@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+"""Headless plot rendering
+
+This module provides functions for plotting error histograms from their
+pre-binned counts (`mat.ErrStats.hist`), so drawing a plot only costs as
+much as its number of bins, however many values were simulated.
+
+A plot is a plain dict, so it can be written to JSON by one run (i.e.
+`simulation --hist-out`) and rendered later or elsewhere:
+
+    {"name": ..., "title": ..., "edges": [...], "series": [
+        {"label": ..., "counts": [...], "count": ..., "values": ...}, ...]}
+
+Plots are drawn on their own `Figure` with the Agg canvas, without going
+through `pyplot`, so no display is needed and many plots can be rendered
+to PNG or SVG files at once in worker processes.
+
+When called directly as main, it renders every plot in some histogram
+files.
+
+```
+$ python -m mlcsim.render --help
+
+usage: render.py [-h] [-o O] [--format {png,svg}] [--jobs JOBS]
+                 files [files ...]
+
+positional arguments:
+  files               histogram JSON files, i.e. from simulation --hist-out
+
+options:
+  -h, --help          show this help message and exit
+  -o O                output directory
+  --format {png,svg}  image format
+  --jobs JOBS         number of worker processes
+```
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
+from matplotlib.figure import Figure  # type: ignore
+from matplotlib.ticker import PercentFormatter  # type: ignore
+
+try:
+    from mat import ErrStats  # type: ignore
+except ImportError:
+    from mlcsim.mat import ErrStats
+
+Plot = Dict[str, Any]
+
+
+def histogramSeries(label: str, stats: ErrStats) -> Dict[str, Any]:
+    """Histogram of one config, for `histogramPlot`
+
+    Args:
+        label (str): Legend label, i.e. the config
+        stats (ErrStats): Error statistics of the config
+
+    Returns:
+        dict: Bin counts and totals
+    """
+    return {
+        "label": label,
+        "counts": stats.hist.tolist(),
+        "count": stats.count,
+        "values": stats.values,
+        "mean": stats.mean,
+    }
+
+
+def histogramPlot(
+    title: str, series: List[Dict[str, Any]], name: Optional[str] = None
+) -> Plot:
+    """Plot of the histograms of some configs
+
+    Args:
+        title (str): Plot title
+        series (list): Histograms from `histogramSeries`, all with the same bins
+        name (str): File name to render to, without the extension
+
+    Returns:
+        dict: Plot
+    """
+    bins = len(series[0]["counts"]) if series else 0
+    return {
+        "name": name,
+        "title": title,
+        "edges": np.linspace(0, 1, bins + 1).tolist(),
+        "series": series,
+    }
+
+
+def drawHistograms(ax, plot: Plot):
+    """Draw a plot's histograms on some axes
+
+    Each histogram is drawn as the fraction of the config's errors in each
+    bin.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw on
+        plot (dict): Plot from `histogramPlot`
+    """
+    edges = np.asarray(plot["edges"])
+    for series in plot["series"]:
+        counts = np.asarray(series["counts"], dtype=np.float64)
+        ax.stairs(counts / max(series["count"], 1), edges, label=series["label"])
+    ax.set_title(plot["title"])
+    ax.xaxis.set_major_formatter(PercentFormatter(1))
+    ax.yaxis.set_major_formatter(PercentFormatter(1))
+    ax.set_ylim([0, 1])
+    ax.set_xlabel("Percentage error")
+    ax.set_ylabel("Fraction of errors")
+    ax.legend(fontsize="small")
+
+
+def renderPlot(plot: Plot, path: str) -> str:
+    """Render a plot to an image file
+
+    Args:
+        plot (dict): Plot from `histogramPlot`
+        path (str): Output path, the format is taken from its extension
+
+    Returns:
+        str: The output path
+    """
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    drawHistograms(fig.add_subplot(), plot)
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def _renderWorker(job: Tuple[Plot, str]) -> str:
+    return renderPlot(*job)
+
+
+def renderPlots(
+    plots: List[Plot], out_dir: str, fmt: str = "png", jobs: int = 1
+) -> List[str]:
+    """Render many plots to image files
+
+    Plots are named by their `name`, or by their index if they have none.
+
+    Args:
+        plots (list): Plots from `histogramPlot`
+        out_dir (str): Output directory, created if needed
+        fmt (str): Image format, i.e. png or svg
+        jobs (int): Number of worker processes
+
+    Returns:
+        list: Path of each rendered plot
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    work = [
+        (plot, os.path.join(out_dir, f"{plot.get('name') or f'plot-{i}'}.{fmt}"))
+        for i, plot in enumerate(plots)
+    ]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            return list(ex.map(_renderWorker, work, chunksize=4))
+    return [_renderWorker(job) for job in work]
+
+
+def loadPlots(path: str) -> List[Plot]:
+    """Read the plots of a histogram file
+
+    Args:
+        path (str): JSON file holding one plot or a list of them
+
+    Returns:
+        list: Plots, named after the file if they have no name
+    """
+    with open(path) as f:
+        plots = json.load(f)
+    if isinstance(plots, dict):
+        plots = [plots]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for i, plot in enumerate(plots):
+        if not plot.get("name"):
+            plot["name"] = stem if len(plots) == 1 else f"{stem}-{i}"
+    return plots
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "files", nargs="+", help="histogram JSON files, i.e. from simulation --hist-out"
+    )
+    parser.add_argument("-o", default=".", help="output directory")
+    parser.add_argument(
+        "--format", default="png", choices=["png", "svg"], help="image format"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count(), help="number of worker processes"
+    )
+
+    args = parser.parse_args()
+
+    plots = [plot for path in args.files for plot in loadPlots(path)]
+    for path in renderPlots(plots, args.o, args.format, args.jobs):
+        print(path)
+
+
+if __name__ == "__main__":
+    _main()
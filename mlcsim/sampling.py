@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+"""Sampling and confidence intervals
+
+This module provides quasi-random sampling of the stored values and their
+faults, as an alternative to drawing them with `np.random`, and confidence
+intervals on simulation results that match how the values were drawn.
+
+With the `sobol` sampler, each value is one point of a scrambled Sobol
+sequence in `2 * c` dimensions (`scipy.stats.qmc.Sobol`): the first `c`
+coordinates pick the level of each cell and the last `c` are the uniforms
+which decide whether each cell faults, the same way as
+`mat.injectFaultsArray`. The points cover the unit cube much more evenly
+than independent draws, so the number of values stored at each level and
+the number of faults of each kind are close to exact, and the mean error
+converges with far fewer values. Sizes should be powers of 2 to keep the
+balance properties of the sequence.
+
+Configs are compared on common random numbers: all configs of a
+`engine.ConfigEngine` see the same faulted chunks, and configs simulated
+separately (i.e. with their own read thresholds) get the same seeds, so
+their levels and fault uniforms are the same. Their differences are taken
+batch by batch, which cancels most of the noise they share.
+
+Intervals come from batch means. With pseudo-random values every chunk is
+an independent batch. Chunks of one Sobol sequence are not independent, so
+instead each independently scrambled replicate is one batch (randomized
+QMC), and at least 2 replicates are needed.
+"""
+
+from typing import Generator, Iterable, Optional, Tuple
+
+import numpy as np
+from scipy import stats as ss  # type: ignore
+from scipy.stats import qmc  # type: ignore
+
+try:
+    from engine import ConfigEngine  # type: ignore
+    from mat import injectFaultsArray  # type: ignore
+    from packed import PackedMatrix  # type: ignore
+    from progress import Progress  # type: ignore
+except ImportError:
+    from mlcsim.engine import ConfigEngine
+    from mlcsim.mat import injectFaultsArray
+    from mlcsim.packed import PackedMatrix
+    from mlcsim.progress import Progress
+
+SAMPLERS = ["random", "sobol"]
+
+
+def sobolChunks(
+    b: int, c: int, arr_size: int, chunk_size: int, seed: int = 0
+) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+    """Generates cell values and fault uniforms from a scrambled Sobol sequence
+
+    Args:
+        b (int): Bits per cell
+        c (int): Number of cells
+        arr_size (int): Total number of values
+        chunk_size (int): Number of values per chunk
+        seed (int): Seed of the scrambling
+
+    Yields:
+        tuple: (n, c) array of cell values, and (n, c) array of their fault uniforms
+    """
+    # the default 30 bits only give 2**30 distinct points
+    kwargs = {"bits": 64} if arr_size > 2**30 else {}
+    sobol = qmc.Sobol(2 * c, scramble=True, seed=seed, **kwargs)
+    for start in range(0, arr_size, chunk_size):
+        points = sobol.random(min(chunk_size, arr_size - start))
+        cells = np.minimum(points[:, :c] * 2**b, 2**b - 1).astype(np.uint8)
+        yield cells, points[:, c:]
+
+
+def sampledFaultChunks(
+    chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+    error_map: np.ndarray,
+    b: int,
+    packed: bool = False,
+) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+    """Inject faults into each chunk of cell values with its own uniforms
+
+    Args:
+        chunks (iterable): Cell values and fault uniforms, i.e. from `sobolChunks`
+        error_map (list): Error map
+        b (int): Bits per cell
+        packed (bool): Whether to yield `PackedMatrix` chunks
+
+    Yields:
+        tuple: Clean and dirty chunk
+    """
+    for cells, rand in chunks:
+        dirty = injectFaultsArray(cells, error_map, None, rand)
+        if packed:
+            yield PackedMatrix.pack(cells, b), PackedMatrix.pack(dirty, b)
+        else:
+            yield cells, dirty
+
+
+def batchRun(
+    engine: ConfigEngine,
+    pairs: Iterable[Tuple[np.ndarray, np.ndarray]],
+    per_chunk: bool = True,
+    progress: Optional[Progress] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Evaluate every config against a stream of faulted blocks, in batches
+
+    The engine's statistics are updated like with `ConfigEngine.run`.
+
+    Args:
+        engine (ConfigEngine): Engine to update
+        pairs (iterable): Clean and dirty blocks
+        per_chunk (bool): Whether each chunk is a batch, or the whole stream is one
+        progress (Progress): Progress to report the values and faults to
+
+    Returns:
+        tuple: (configs, batches) error sum of each batch, and (batches,) values of each batch
+    """
+
+    def totals() -> np.ndarray:
+        return np.array([st.total for st in engine.stats])[engine.inverse]
+
+    sums = []
+    values = []
+    last = totals()
+    done = 0
+    for clean, dirty in pairs:
+        faults = engine.update(clean, dirty)
+        done += len(clean)
+        if progress is not None:
+            progress.update(len(clean), faults=faults)
+        if per_chunk:
+            cur = totals()
+            sums.append(cur - last)
+            values.append(done)
+            last, done = cur, 0
+    if not per_chunk:
+        sums.append(totals() - last)
+        values.append(done)
+    return np.stack(sums, axis=1), np.array(values, dtype=np.float64)
+
+
+def _interval(
+    sums: np.ndarray, values: np.ndarray, level: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    # ratio estimator of the mean per value, and its t interval over batches
+    total = values.sum()
+    mean = sums.sum(axis=1) / total
+    batches = sums.shape[1]
+    if batches < 2:
+        return mean, np.full_like(mean, np.nan)
+    resid = sums - mean[:, None] * values
+    se = np.sqrt(batches / (batches - 1) * (resid**2).sum(axis=1)) / total
+    return mean, ss.t.ppf((1 + level) / 2, batches - 1) * se
+
+
+def intervals(
+    sums: np.ndarray, values: np.ndarray, ref: int = 0, level: float = 0.95
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Confidence intervals of the error per value of each config
+
+    Args:
+        sums (np.ndarray): (configs, batches) error sums, i.e. from `batchRun`
+        values (np.ndarray): (batches,) values of each batch
+        ref (int): Config the others are compared to
+        level (float): Confidence level
+
+    Returns:
+        tuple: Mean error per value and its half width, and mean difference to the ref config and its half width
+    """
+    mean, half = _interval(sums, values, level)
+    diff, diff_half = _interval(sums - sums[ref], values, level)
+    return mean, half, diff, diff_half
@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+
+"""Local search for cell configurations
+
+This module provides a simulated annealing search for the best cell
+configurations of geometries too large for `cconfigs.sortConfigs` to
+enumerate. Configs are ranked the same way, by the stdev of the per-cell
+error sums and then by the total error sum.
+
+A move swaps one bit between two cells. The error sum of a cell is linear
+in the values of its bits,
+
+    sum_i w_i * step_i = sum_k W_k * 2**cell[k]
+
+where `w_i` is the chance of an error between levels `i` and `i + 1` and
+`W_k` only depends on the error map (see `cellWeights`), so only the two
+affected cells are rescored, in O(b), and the stdev is updated from running
+sums instead of rescoring the whole config.
+
+When called directly as main, it prints the best configs found within the
+time budget.
+
+```
+$ python -m mlcsim.search --help
+
+usage: search.py [-h] [-b {2,3,4,5,6,7,8}] [-c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}] --thr THR
+                 [--time TIME] [--restarts RESTARTS] [--jobs JOBS] [--top TOP] [--seed SEED]
+                 [-o O]
+
+options:
+  -h, --help            show this help message and exit
+  -b {2,3,4,5,6,7,8}    bits per cell
+  -c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}
+                        num of cells
+  --thr THR             Threshold map JSON
+  --time TIME           time budget in seconds
+  --restarts RESTARTS   number of independent restarts
+  --jobs JOBS           number of worker processes
+  --top TOP             number of configs to report
+  --seed SEED           random seed
+  -o O                  output best configs to file
+```
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from cconfigs import Config  # type: ignore
+    from dist import genErrorMap  # type: ignore
+    from shm import ArraySpec, SharedArrays, attach  # type: ignore
+except ImportError:
+    from mlcsim.cconfigs import Config
+    from mlcsim.dist import genErrorMap
+    from mlcsim.shm import ArraySpec, SharedArrays, attach
+
+
+def cellWeights(error_map: List[List[float]], b: int) -> List[float]:
+    """Calculates the weight of each bit position of a cell
+
+    The error sum of a cell with bits `cell` (ascending) is
+    `sum(W[k] * 2**cell[k])`.
+
+    Args:
+        error_map (list): Error map
+        b (int): Bits per cell
+
+    Returns:
+        list: Weight W_k of each bit position k
+    """
+    weights = [0.0] * b
+    for i in range(2**b - 1):
+        w = error_map[i][1] + error_map[i + 1][0]
+        for k in range(b):
+            weights[k] += w * (((i + 1) >> k & 1) - (i >> k & 1))
+    return weights
+
+
+def cellScore(cell: List[int], weights: List[float]) -> float:
+    """Calculates the error sum of a cell
+
+    Args:
+        cell (list): List of bits in a cell
+        weights (list): Bit position weights from `cellWeights`
+
+    Returns:
+        float: Error sum of the cell
+    """
+    return sum(w * 2**bit for w, bit in zip(weights, sorted(cell)))
+
+
+def _stdev(total: float, total_sq: float, c: int) -> float:
+    return math.sqrt(max(total_sq - total * total / c, 0.0) / (c - 1))
+
+
+def _anneal(
+    b: int, c: int, weights: List[float], budget: float, top: int, seed: int
+) -> List[Tuple[float, List[List[int]], float]]:
+    rng = random.Random(seed)
+    deadline = time.monotonic() + budget
+
+    bits = list(range(b * c))
+    rng.shuffle(bits)
+    cells = [sorted(bits[i * b : (i + 1) * b]) for i in range(c)]
+    scores = [cellScore(cell, weights) for cell in cells]
+    total = sum(scores)
+    total_sq = sum(s * s for s in scores)
+    energy = _stdev(total, total_sq, c)
+
+    # start hot enough to accept a typical uphill move
+    temp = max(energy, 1e-300)
+    t0 = temp
+    best: List[Tuple[float, float, Config]] = []
+    seen = set()
+
+    step = 0
+    while True:
+        if step % 1024 == 0:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            temp = t0 * (left / budget) ** 3
+            # resync the running sums to avoid drift
+            total = sum(scores)
+            total_sq = sum(s * s for s in scores)
+        step += 1
+
+        p, q = rng.sample(range(c), 2)
+        x = rng.randrange(b)
+        y = rng.randrange(b)
+        new_p = cells[p][:]
+        new_q = cells[q][:]
+        new_p[x], new_q[y] = cells[q][y], cells[p][x]
+        new_p.sort()
+        new_q.sort()
+        sp = cellScore(new_p, weights)
+        sq = cellScore(new_q, weights)
+
+        new_total = total - scores[p] - scores[q] + sp + sq
+        new_total_sq = total_sq - scores[p] ** 2 - scores[q] ** 2 + sp * sp + sq * sq
+        new_energy = _stdev(new_total, new_total_sq, c)
+
+        delta = new_energy - energy
+        if delta > 0 and rng.random() >= math.exp(-delta / max(temp, 1e-300)):
+            continue
+
+        cells[p], cells[q] = new_p, new_q
+        scores[p], scores[q] = sp, sq
+        total, total_sq, energy = new_total, new_total_sq, new_energy
+
+        if len(best) < top or -best[0][0] > energy:
+            cfg = Config.fromList(cells).canonical()
+            if cfg in seen:
+                continue
+            seen.add(cfg)
+            heapq.heappush(best, (-energy, total, cfg))
+            if len(best) > top:
+                seen.discard(heapq.heappop(best)[2])
+
+    return [(-e, cfg.toList(), s) for e, s, cfg in best]
+
+
+def _worker(
+    job: Tuple[int, int, ArraySpec, float, int, List[int]],
+) -> List[Tuple[float, List[List[int]], float]]:
+    # run this worker's share of the restarts one after another
+    b, c, spec, budget, top, seeds = job
+    weights = attach(spec).tolist()
+    return [
+        res
+        for seed in seeds
+        for res in _anneal(b, c, weights, budget / len(seeds), top, seed)
+    ]
+
+
+def searchConfigs(
+    b: int,
+    c: int,
+    error_map: List[List[float]],
+    budget: float = 10.0,
+    restarts: int = 4,
+    jobs: Optional[int] = None,
+    top: int = 10,
+    seed: int = 0,
+) -> List[Tuple[float, List[List[int]], float]]:
+    """Search for the best cell configs with simulated annealing
+
+    Args:
+        b (int): Bits per cell
+        c (int): Number of cells, at least 2
+        error_map (list): Error map
+        budget (float): Time budget of the whole search in seconds
+        restarts (int): Number of independent restarts, run in parallel
+        jobs (int): Number of worker processes, defaults to one per CPU
+        top (int): Number of configs to return
+        seed (int): Random seed
+
+    Raises:
+        ValueError: If c is less than 2
+
+    Returns:
+        list: Best configs found as (stdev, config, err_sum), sorted like `sortConfigs`
+    """
+    if c < 2:
+        raise ValueError("Need at least 2 cells to search")
+    weights = cellWeights(error_map, b)
+    jobs = min(jobs or os.cpu_count() or 1, restarts)
+    seeds = [list(range(seed + i, seed + restarts, jobs)) for i in range(jobs)]
+
+    with SharedArrays() as shared:
+        spec = shared.put("weights", np.asarray(weights, dtype=np.float64))
+        work = [(b, c, spec, budget, top, s) for s in seeds]
+        with ProcessPoolExecutor(max_workers=jobs) as ex:
+            found = [res for results in ex.map(_worker, work) for res in results]
+
+    out: List[Tuple[float, List[List[int]], float]] = []
+    seen = set()
+    for res in sorted(found):
+        cfg = Config.fromList(res[1])
+        if cfg not in seen:
+            seen.add(cfg)
+            out.append(res)
+    return out[:top]
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-b", type=int, default=2, choices=range(2, 9), help="bits per cell"
+    )
+    parser.add_argument(
+        "-c", type=int, default=2, choices=range(2, 17), help="num of cells"
+    )
+    parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument(
+        "--time", type=float, default=10.0, help="time budget in seconds"
+    )
+    parser.add_argument(
+        "--restarts", type=int, default=4, help="number of independent restarts"
+    )
+    parser.add_argument("--jobs", type=int, help="number of worker processes")
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of configs to report"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("-o", type=str, help="output best configs to file")
+
+    args = parser.parse_args()
+
+    with open(args.thr) as f:
+        thr_map = json.load(f)
+    error_map = genErrorMap(thr_map, args.b)
+
+    sums = searchConfigs(
+        args.b,
+        args.c,
+        error_map,
+        args.time,
+        args.restarts,
+        args.jobs,
+        args.top,
+        args.seed,
+    )
+
+    print(
+        "|",
+        "config".ljust(len(str(sums[0][1])) + 2),
+        "|",
+        "stdev".rjust(12),
+        "|",
+        "sum * err".rjust(12),
+        "|",
+    )
+    print(
+        "|"
+        + ("-" * (len(str(sums[0][1])) + 4))
+        + "|"
+        + ("-" * 14)
+        + "|"
+        + ("-" * 14)
+        + "|"
+    )
+    for thing in sums:
+        print(f"| `{thing[1]}` | {thing[0]:10.10f} | {thing[2]:10.10f} |")
+
+    if args.o is not None:
+        with open(args.o, "w") as outfile:
+            json.dump([thing[1] for thing in sums], outfile)
+
+
+if __name__ == "__main__":
+    _main()
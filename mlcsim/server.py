@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+
+"""Local warm-cache service
+
+This module provides an asyncio-based local server which keeps error maps,
+sorted config indexes and `MLCSim` instances warm in bounded LRU caches, so
+that repeated queries in an interactive session don't pay for Python startup,
+`genErrorMap` and `sortConfigs` every time.
+
+Requests and responses are single JSON objects, one per line, sent over a
+Unix socket (default) or a localhost TCP port. Paths in requests are resolved
+by the server, so they should be absolute (the client does this for you).
+
+When called directly as main, it starts the server.
+
+```
+$ python -m mlcsim.server --help
+
+usage: server.py [-h] [--socket SOCKET] [--port PORT] [--cache-size CACHE_SIZE]
+                 [--workers WORKERS]
+
+options:
+  -h, --help            show this help message and exit
+  --socket SOCKET       Unix socket path to listen on
+  --port PORT           listen on localhost TCP port instead of a Unix socket
+  --cache-size CACHE_SIZE
+                        max entries per cache
+  --workers WORKERS     threads used for uncached work
+```
+
+Use `mlcsim.client` to query a running server.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket as sock
+import stat
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+try:
+    from MLCSim import MLCSim  # type: ignore
+    from cconfigs import Config, countConfigs, sortConfigs  # type: ignore
+    from dist import genErrorMap  # type: ignore
+except ImportError:
+    from mlcsim.MLCSim import MLCSim
+    from mlcsim.cconfigs import Config, countConfigs, sortConfigs
+    from mlcsim.dist import genErrorMap
+
+DEFAULT_SOCKET = "/tmp/mlcsim.sock"
+
+# most configs ranked per request, above this `findAllConfigs` would prompt
+MAX_CONFIGS = 10**7
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 32):
+        """init LRUCache
+
+        Args:
+            maxsize (int): Max number of entries kept before evicting the least recently used
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._pending: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    async def get(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        """Get a cached value, computing it if missing
+
+        Concurrent requests for the same missing key share one computation.
+
+        Args:
+            key (hashable): Cache key
+            compute (callable): Returns an awaitable producing the value
+
+        Returns:
+            any: Cached value
+        """
+        if key in self._data:
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+        if key in self._pending:
+            self.hits += 1
+            return await asyncio.shield(self._pending[key])
+
+        self.misses += 1
+        fut = asyncio.ensure_future(compute())
+        self._pending[key] = fut
+        try:
+            val = await fut
+        finally:
+            del self._pending[key]
+
+        self._data[key] = val
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return val
+
+    def info(self) -> Dict[str, int]:
+        """Cache statistics
+
+        Returns:
+            dict: Current size, max size, hits and misses
+        """
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _fileKey(path: str) -> Tuple[str, float]:
+    # include the mtime so edited files are picked up without a restart
+    path = os.path.abspath(path)
+    return (path, os.stat(path).st_mtime)
+
+
+def _loadJson(path: str) -> Any:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _configKey(config: List[List[int]]) -> Tuple[Tuple[int, ...], ...]:
+    return tuple(tuple(cell) for cell in config)
+
+
+def _canonicalKey(config: List[List[int]]) -> Config:
+    # cell order doesn't change the ranking, the bit order within a cell does
+    return Config.fromList(config).canonical()
+
+
+def _staleSocket(path: str) -> bool:
+    # a socket file nothing is listening on anymore
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        return False
+    with sock.socket(sock.AF_UNIX, sock.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+        except ConnectionRefusedError:
+            return True
+    return False
+
+
+class MLCServer:
+    def __init__(self, cache_size: int = 32, workers: int = 4):
+        """init MLCServer
+
+        Args:
+            cache_size (int): Max entries per cache
+            workers (int): Threads used for uncached work
+        """
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.thr_maps = LRUCache(cache_size)
+        self.error_maps = LRUCache(cache_size)
+        self.rankings = LRUCache(cache_size)
+        self.mlcs = LRUCache(cache_size * 8)
+        self.commands: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "enc": self.enc,
+            "dec": self.dec,
+            "errmap": self.errmap,
+            "sort": self.sort,
+            "stats": self.stats,
+            "info": self.info,
+        }
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        return asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def _config(self, req: Dict[str, Any]) -> List[List[int]]:
+        if "config" in req:
+            return req["config"]
+        return await self._run(_loadJson, req["f"])
+
+    async def _mlc(self, config: List[List[int]]) -> MLCSim:
+        async def compute():
+            return MLCSim(config)
+
+        return await self.mlcs.get(_configKey(config), compute)
+
+    async def _errorMap(self, thr: str, b: int) -> List[List[float]]:
+        key = _fileKey(thr)
+
+        async def loadThr():
+            return await self._run(_loadJson, key[0])
+
+        async def compute():
+            thr_map = await self.thr_maps.get(key, loadThr)
+            return await self._run(genErrorMap, thr_map, b)
+
+        return await self.error_maps.get(key + (b,), compute)
+
+    async def _ranking(
+        self, thr: str, b: int, c: int
+    ) -> Tuple[List[Tuple[float, List[List[int]], float]], Dict[Any, int]]:
+        count = countConfigs(b, c)
+        if count > MAX_CONFIGS:
+            raise ValueError(
+                f"{c}x{b} has {count} configs, more than the {MAX_CONFIGS} ranked"
+            )
+        error_map = await self._errorMap(thr, b)
+
+        def compute_sync():
+            sums = sortConfigs(b, c, error_map)
+            index = {_canonicalKey(cfg): i for i, (_, cfg, _) in enumerate(sums)}
+            return sums, index
+
+        async def compute():
+            return await self._run(compute_sync)
+
+        return await self.rankings.get(_fileKey(thr) + (b, c), compute)
+
+    async def enc(self, req: Dict[str, Any]) -> List[int]:
+        """Encode a value, see `MLCSim.enc`"""
+        mlc = await self._mlc(await self._config(req))
+        return mlc.enc(int(req["val"]))
+
+    async def dec(self, req: Dict[str, Any]) -> int:
+        """Decode a list of cells, see `MLCSim.dec`"""
+        mlc = await self._mlc(await self._config(req))
+        return mlc.dec([int(x) for x in req["val"]])
+
+    async def errmap(self, req: Dict[str, Any]) -> List[List[float]]:
+        """Error map of a threshold map, see `dist.genErrorMap`"""
+        return await self._errorMap(req["thr"], int(req["b"]))
+
+    async def sort(self, req: Dict[str, Any]) -> List[Any]:
+        """Ranked configs, see `cconfigs.sortConfigs`
+
+        Only the first `top` entries are returned if `top` is given.
+        """
+        sums, _ = await self._ranking(req["thr"], int(req["b"]), int(req["c"]))
+        top = req.get("top")
+        return [list(s) for s in (sums if top is None else sums[: int(top)])]
+
+    async def stats(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """Rank, stdev and error sum of a single config
+
+        The config can list its cells in any order, the bits of each cell
+        must be ascending.
+        """
+        config = await self._config(req)
+        b = len(config[0])
+        c = len(config)
+        sums, index = await self._ranking(req["thr"], b, c)
+        key = _canonicalKey(config)
+        if key not in index:
+            raise ValueError(f"Config {config} is not a valid {c}x{b} config")
+        rank = index[key]
+        std, _, err_sum = sums[rank]
+        return {"rank": rank, "of": len(sums), "stdev": std, "err_sum": err_sum}
+
+    async def info(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache statistics"""
+        return {
+            "thr_maps": self.thr_maps.info(),
+            "error_maps": self.error_maps.info(),
+            "rankings": self.rankings.info(),
+            "mlcs": self.mlcs.info(),
+        }
+
+    async def handle(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle a single request
+
+        Args:
+            req (dict): Request with a `cmd` key and the command's arguments
+
+        Returns:
+            dict: Response with `ok` and either `result` or `error`
+        """
+        try:
+            cmd = self.commands[req.get("cmd", "")]
+        except KeyError:
+            return {"ok": False, "error": f"Unknown command: {req.get('cmd')}"}
+        try:
+            return {"ok": True, "result": await cmd(req)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    req = json.loads(line)
+                except ValueError as e:
+                    resp: Dict[str, Any] = {"ok": False, "error": f"Bad request: {e}"}
+                else:
+                    resp = await self.handle(req)
+                writer.write(json.dumps(resp).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, socket: Optional[str] = None, port: Optional[int] = None):
+        """Start listening
+
+        Args:
+            socket (str): Unix socket path (used if port is None)
+            port (int): Localhost TCP port
+
+        Raises:
+            FileExistsError: If something other than a stale socket is at the socket path
+
+        Returns:
+            asyncio.AbstractServer: The running server
+        """
+        if port is not None:
+            return await asyncio.start_server(self._client, "127.0.0.1", port)
+        path = socket or DEFAULT_SOCKET
+        if os.path.exists(path):
+            # only replace the socket of a server that is gone
+            if not _staleSocket(path):
+                raise FileExistsError(f"{path} exists and is not a stale socket")
+            os.unlink(path)
+        return await asyncio.start_unix_server(self._client, path)
+
+
+def _main():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--socket", default=DEFAULT_SOCKET, help="Unix socket path to listen on"
+    )
+    parser.add_argument(
+        "--port", type=int, help="listen on localhost TCP port instead of a Unix socket"
+    )
+    parser.add_argument(
+        "--cache-size", type=int, default=32, help="max entries per cache"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="threads used for uncached work"
+    )
+
+    args = parser.parse_args()
+
+    srv = MLCServer(args.cache_size, args.workers)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = loop.run_until_complete(srv.start(args.socket, args.port))
+
+    where = f"127.0.0.1:{args.port}" if args.port is not None else args.socket
+    print(f"Listening on {where}")
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        loop.run_until_complete(server.wait_closed())
+        if args.port is None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+"""Shared memory arrays
+
+This module provides a registry of NumPy arrays in shared memory, for
+handing large read-only inputs (decode tables, error maps, weights) to
+worker processes without pickling a copy of them into every task.
+
+The parent process copies each array once into a block of
+`multiprocessing.shared_memory` with `SharedArrays.put`, and passes the
+small `spec` of the block to the workers instead of the array. Workers
+`attach` to the block by name and get a read-only view of it, with no
+copy. Attached blocks stay mapped for the life of the worker, so a pooled
+worker only attaches once however many tasks it runs.
+
+Blocks are owned by the `SharedArrays` that created them, and are closed
+and unlinked together by `SharedArrays.close`, or when leaving its `with`
+block, so nothing outlives the run even if a worker fails.
+"""
+
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple
+
+import numpy as np
+
+# name of the shared memory block, shape and dtype of an array
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+# blocks attached to by this process, kept open for the views into them
+_attached: Dict[str, SharedMemory] = {}
+
+
+class SharedArrays:
+    def __init__(self):
+        """init SharedArrays
+
+        Registry of the shared memory blocks created by this process.
+        """
+        self._blocks: Dict[str, SharedMemory] = {}
+        self.specs: Dict[str, ArraySpec] = {}
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, key: str, arr: np.ndarray) -> ArraySpec:
+        """Copy an array into a new shared memory block
+
+        Args:
+            key (str): Key of the array in the registry
+            arr (np.ndarray): Array to share
+
+        Raises:
+            ValueError: If the key is already used, or the array holds Python objects
+
+        Returns:
+            tuple: Spec of the array, for `attach`
+        """
+        if key in self.specs:
+            raise ValueError(f"Shared array {key} already exists")
+        arr = np.ascontiguousarray(arr)
+        if arr.dtype.hasobject:
+            raise ValueError(f"Can't share {arr.dtype} arrays")
+
+        # blocks can't be empty
+        shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+        self._blocks[key] = shm
+        np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+        self.specs[key] = (shm.name, arr.shape, arr.dtype.str)
+        return self.specs[key]
+
+    def get(self, key: str) -> np.ndarray:
+        """Read-only view of an array in the registry
+
+        Args:
+            key (str): Key of the array
+
+        Returns:
+            np.ndarray: View of the shared array
+        """
+        name, shape, dtype = self.specs[key]
+        view = np.ndarray(shape, np.dtype(dtype), buffer=self._blocks[key].buf)
+        view.flags.writeable = False
+        return view
+
+    def close(self):
+        """Release and remove every block in the registry"""
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+        self._blocks.clear()
+        self.specs.clear()
+
+
+def attach(spec: ArraySpec) -> np.ndarray:
+    """Read-only view of a shared array, i.e. from a worker process
+
+    Args:
+        spec (tuple): Spec from `SharedArrays.put`
+
+    Returns:
+        np.ndarray: View of the shared array
+    """
+    name, shape, dtype = spec
+    if name not in _attached:
+        _attached[name] = SharedMemory(name=name)
+    view = np.ndarray(shape, np.dtype(dtype), buffer=_attached[name].buf)
+    view.flags.writeable = False
+    return view
+
+
+def attachAll(specs: Dict[str, ArraySpec]) -> Dict[str, np.ndarray]:
+    """Read-only views of some shared arrays
+
+    Args:
+        specs (dict): Specs by key, i.e. `SharedArrays.specs`
+
+    Returns:
+        dict: View of each shared array by key
+    """
+    return {key: attach(spec) for key, spec in specs.items()}
@@ -9,46 +9,172 @@ checking each of their error mean and stdev to single-level errors.
 ```
 $ python -m mlcsim.simulation --help
 
-usage: simulation.py [-h] [-b {2,3,4}] [-c {2,3,4,5,6,7,8}] [-f F] [--arr-size ARR_SIZE]
-                     [--iter-size ITER_SIZE] [--thr THR] [--plot]
+usage: simulation.py [-h] [-b {2,3,4,5,6,7,8}]
+                     [-c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}] [-f F]
+                     [-n NUM_CONFIGS] [--arr-size ARR_SIZE]
+                     [--iter-size ITER_SIZE] [--thr THR] [--plot] [--data DATA]
+                     [--dtype DTYPE] [--chunk-size CHUNK_SIZE]
+                     [--tensor {float16,bfloat16,float32,int8,int16}] [--packed]
+                     [--opt-reads] [--coupling COUPLING [COUPLING ...]]
+                     [--ecc {secded,parity}] [--ecc-words ECC_WORDS]
+                     [--jobs JOBS] [--hist-out HIST_OUT] [--plot-out PLOT_OUT]
+                     [--progress] [--progress-json PROGRESS_JSON]
+                     [--sampler {random,sobol}] [--replicates REPLICATES]
 
 options:
   -h, --help            show this help message and exit
-  -b {2,3,4}            bits per cell
-  -c {2,3,4,5,6,7,8}    num of cells
+  -b {2,3,4,5,6,7,8}    bits per cell
+  -c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}
+                        num of cells
   -f F                  config JSON
+  -n NUM_CONFIGS, --num-configs NUM_CONFIGS
+                        number of best and worst configs to test without -f
   --arr-size ARR_SIZE   size of the array to test
   --iter-size ITER_SIZE
                         number of arrays to test
   --thr THR             Threshold map to test
   --plot
+  --data DATA           .npy or raw binary file of words to store instead of random values
+  --dtype DTYPE         word dtype of a raw --data file
+  --chunk-size CHUNK_SIZE
+                        values per chunk held in memory at once
+  --tensor {float16,bfloat16,float32,int8,int16}
+                        store --data as a tensor of this dtype and report numeric deviation
+  --packed              keep random cells bit-packed in memory
+  --opt-reads           optimize the read thresholds of each config
+  --coupling COUPLING [COUPLING ...]
+                        neighbour coupling in the row, across rows and diagonally
+  --ecc {secded,parity}
+                        error correcting code over the decoded words
+  --ecc-words ECC_WORDS
+                        number of consecutive words per codeword
+  --jobs JOBS           number of worker processes sharing the random values
+  --hist-out HIST_OUT   output the error histograms to JSON
+  --plot-out PLOT_OUT   render the error histograms to a PNG or SVG file
+  --progress            show throughput and ETA on stderr while running
+  --progress-json PROGRESS_JSON
+                        write progress as JSON lines to a file, - for stdout
+  --sampler {random,sobol}
+                        how to draw the random values and their faults
+  --replicates REPLICATES
+                        number of independently seeded replicates
 ```
-"""
 
+Values are generated, faulted, decoded and accumulated one chunk at a time,
+so peak memory only depends on `--chunk-size` (which can be tuned to fit
+in cache) and not on `--arr-size`, which also accepts powers like `2**30`.
+With `--packed`, chunks are kept as `packed.PackedMatrix` with several
+cells per byte. All configs are evaluated against each faulted chunk in one
+pass by `engine.ConfigEngine`, so hundreds of configs can be compared.
+
+With `--data`, the words of the file are streamed through memory-mapped
+I/O, encoded with each config, faulted and decoded, so files larger than
+RAM can be simulated in bounded memory. With `--tensor`, each element's
+bit pattern is stored instead and errors are reported as the deviation of
+the decoded value, including the rate of NaN and Inf results. Faulted
+zeros have no relative deviation and are counted apart.
+
+With `--opt-reads`, each config is ranked and simulated with its own
+error map, read at the thresholds from `reads.optimalErrorMaps`, unless
+the thresholds of all configs are the same. With `--coupling`, random
+cells fail depending on the levels of their neighbours (see `coupling`)
+instead of independently. With `--ecc`, the decoded words are corrected
+(see `ecc`) and the errors left are reported, along with how many
+codewords were corrected, flagged or silently wrong. With `--jobs`, the
+random values are split between worker processes which share the decode
+tables through `shm` (see `engine.simulateParallel`).
+
+The error histograms are binned while simulating, so `--plot` and
+`--plot-out` draw from the bin counts (see `render`) no matter how many
+values were tested, and `--plot-out` needs no display. `--hist-out` saves
+the counts to render later with `python -m mlcsim.render`.
+
+With `--progress` and `--progress-json`, the ranking of the configs and the
+simulation report their throughput, faults seen, elapsed time and ETA as
+they run (see `progress`).
+
+With `--sampler sobol`, the random values and their faults are drawn from
+a scrambled Sobol sequence instead (see `sampling`), which needs far fewer
+values for the same precision. With `--sampler sobol` or `--replicates`,
+the results are followed by 95% confidence intervals of the error per
+value of each config and of its difference to the first config, taken
+over the chunks of pseudo-random values or over the Sobol replicates.
+"""
 
-import random
 import sys
-from typing import List, Union
+from typing import List, Optional, TextIO, Union
 import numpy as np
 import argparse
 import json
-import copy
 
 # from pprint import pprint
 
-import matplotlib.pyplot as plt  # type: ignore
-from matplotlib.ticker import PercentFormatter  # type: ignore
-
-from statistics import stdev
-
 try:
-    from cconfigs import sortConfigs  # type: ignore
-    from mat import generateMatrix, injectFaults, calcErrMagnitude  # type: ignore
+    from cconfigs import findAllConfigs, sortConfigs  # type: ignore
+    from mat import generateChunks, faultChunks, readWords, simulateWords, wordBits  # type: ignore
+    from engine import ConfigEngine, simulateParallel  # type: ignore
+    from tensor import TYPES, bitWidth, readTensor, simulateTensor  # type: ignore
+    from packed import generatePackedChunks  # type: ignore
+    from coupling import couplingKernel, coupledFaultChunks  # type: ignore
+    from ecc import CODES, simulateECC  # type: ignore
     from dist import genErrorMap  # type: ignore
+    from reads import optimalErrorMaps, rankConfigs  # type: ignore
+    from render import drawHistograms, histogramPlot, histogramSeries, renderPlot  # type: ignore
+    from progress import Progress, openStream  # type: ignore
+    from sampling import SAMPLERS, batchRun, intervals, sobolChunks, sampledFaultChunks  # type: ignore
 except ImportError:
-    from mlcsim.cconfigs import sortConfigs
-    from mlcsim.mat import generateMatrix, injectFaults, calcErrMagnitude
+    from mlcsim.cconfigs import findAllConfigs, sortConfigs
+    from mlcsim.mat import (
+        generateChunks,
+        faultChunks,
+        readWords,
+        simulateWords,
+        wordBits,
+    )
+    from mlcsim.engine import ConfigEngine, simulateParallel
+    from mlcsim.tensor import TYPES, bitWidth, readTensor, simulateTensor
+    from mlcsim.packed import generatePackedChunks
+    from mlcsim.coupling import couplingKernel, coupledFaultChunks
+    from mlcsim.ecc import CODES, simulateECC
     from mlcsim.dist import genErrorMap
+    from mlcsim.reads import optimalErrorMaps, rankConfigs
+    from mlcsim.render import (
+        drawHistograms,
+        histogramPlot,
+        histogramSeries,
+        renderPlot,
+    )
+    from mlcsim.progress import Progress, openStream
+    from mlcsim.sampling import (
+        SAMPLERS,
+        batchRun,
+        intervals,
+        sobolChunks,
+        sampledFaultChunks,
+    )
+
+
+def _size(val: str) -> int:
+    # accept sizes written as powers, i.e. 2**30
+    if "**" in val:
+        base, exp = val.split("**")
+        return int(base) ** int(exp)
+    return int(val)
+
+
+def _progress(
+    args: argparse.Namespace,
+    stream: Optional[TextIO],
+    task: str,
+    total: Optional[int] = None,
+    unit: str = "values",
+) -> Optional[Progress]:
+    # progress of a task, if any is reported
+    if not args.progress and stream is None:
+        return None
+    return Progress(
+        task, total, unit, terminal=args.progress, stream=stream, b=args.b, c=args.c
+    )
 
 
 def _main(argv: List[str] = []):
@@ -56,25 +182,157 @@ def _main(argv: List[str] = []):
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        "-b", type=int, default=2, choices=[2, 3, 4], help="bits per cell"
+        "-b", type=int, default=2, choices=range(2, 9), help="bits per cell"
     )
     parser.add_argument(
-        "-c", type=int, default=2, choices=[2, 3, 4, 5, 6, 7, 8], help="num of cells"
+        "-c", type=int, default=2, choices=range(2, 17), help="num of cells"
     )
     parser.add_argument("-f", help="config JSON")
     parser.add_argument(
-        "--arr-size", type=int, default=2**8, help="size of the array to test"
+        "-n",
+        "--num-configs",
+        type=int,
+        default=3,
+        help="number of best and worst configs to test without -f",
+    )
+    parser.add_argument(
+        "--arr-size", type=_size, default=2**8, help="size of the array to test"
     )
     parser.add_argument(
-        "--iter-size", type=int, default=2**8, help="number of arrays to test"
+        "--iter-size", type=_size, default=2**8, help="number of arrays to test"
     )
     parser.add_argument("--thr", required=True, help="Threshold map to test")
     parser.add_argument("--plot", action="store_true", default=False)
+    parser.add_argument(
+        "--data",
+        help=".npy or raw binary file of words to store instead of random values",
+    )
+    parser.add_argument(
+        "--dtype", default="uint8", help="word dtype of a raw --data file"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=_size,
+        default=2**16,
+        help="values per chunk held in memory at once",
+    )
+    parser.add_argument(
+        "--tensor",
+        choices=list(TYPES),
+        help="store --data as a tensor of this dtype and report numeric deviation",
+    )
+    parser.add_argument(
+        "--packed",
+        action="store_true",
+        default=False,
+        help="keep random cells bit-packed in memory",
+    )
+    parser.add_argument(
+        "--opt-reads",
+        action="store_true",
+        default=False,
+        help="optimize the read thresholds of each config",
+    )
+    parser.add_argument(
+        "--coupling",
+        type=float,
+        nargs="+",
+        help="neighbour coupling in the row, across rows and diagonally",
+    )
+    parser.add_argument(
+        "--ecc",
+        choices=list(CODES),
+        help="error correcting code over the decoded words",
+    )
+    parser.add_argument(
+        "--ecc-words",
+        type=int,
+        default=1,
+        help="number of consecutive words per codeword",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes sharing the random values",
+    )
+    parser.add_argument("--hist-out", help="output the error histograms to JSON")
+    parser.add_argument(
+        "--plot-out", help="render the error histograms to a PNG or SVG file"
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        default=False,
+        help="show throughput and ETA on stderr while running",
+    )
+    parser.add_argument(
+        "--progress-json",
+        help="write progress as JSON lines to a file, - for stdout",
+    )
+    parser.add_argument(
+        "--sampler",
+        choices=SAMPLERS,
+        default="random",
+        help="how to draw the random values and their faults",
+    )
+    parser.add_argument(
+        "--replicates",
+        type=int,
+        default=1,
+        help="number of independently seeded replicates",
+    )
 
     args = parser.parse_args(argv)
+    if args.coupling is not None:
+        if len(args.coupling) > 3:
+            parser.error("--coupling takes at most 3 coefficients")
+        if args.data is not None:
+            parser.error("--coupling only applies to random values")
+    if args.ecc is not None:
+        if args.data is not None:
+            parser.error("--ecc only applies to random values")
+        if args.chunk_size % args.ecc_words:
+            parser.error("--chunk-size must be a multiple of --ecc-words")
+    if args.jobs > 1:
+        if args.data is not None or args.ecc is not None:
+            parser.error("--jobs only applies to random values without --ecc")
+        if args.b * args.c > 64:
+            parser.error("--jobs needs words of at most 64 bits")
+    sampled = args.sampler != "random" or args.replicates > 1
+    if sampled:
+        if args.data is not None or args.ecc is not None:
+            parser.error(
+                "--sampler and --replicates only apply to random values without --ecc"
+            )
+        if args.coupling is not None or args.jobs > 1:
+            parser.error(
+                "--sampler and --replicates don't apply with --coupling or --jobs"
+            )
+        if args.sampler == "sobol" and args.replicates < 2:
+            parser.error(
+                "--sampler sobol needs at least 2 --replicates for its intervals"
+            )
+
+    if args.tensor is not None:
+        if args.data is None:
+            parser.error("--tensor needs --data")
+        if bitWidth(args.tensor) > args.b * args.c:
+            parser.error(
+                f"--tensor {args.tensor} needs {bitWidth(args.tensor)} bits, "
+                f"more than the {args.b * args.c} bits of a config"
+            )
+    if args.data is not None and args.tensor is None:
+        bits = wordBits(args.data, args.dtype)
+        if bits > args.b * args.c:
+            parser.error(
+                f"--data holds {bits}-bit words, "
+                f"more than the {args.b * args.c} bits of a config"
+            )
 
     b = args.b
     c = args.c
+    stream = openStream(args.progress_json)
 
     # Load the threshold map from file and generate the requisite error map
     with open(args.thr) as f:
@@ -88,87 +346,222 @@ def _main(argv: List[str] = []):
         with open(args.f, "r") as f:
             configs = json.load(f)
     else:
-        all_configs = sortConfigs(args.b, args.c, error_map)
-        if len(all_configs) > 5:
-            configs = [
-                all_configs[0][1],
-                all_configs[1][1],
-                all_configs[2][1],
-                all_configs[-1][1],
-                all_configs[-2][1],
-                all_configs[-3][1],
+        if args.opt_reads:
+            candidates = findAllConfigs(args.b, args.c)
+            all_configs = rankConfigs(
+                candidates, optimalErrorMaps(candidates, thr_map, b)[1]
+            )
+        else:
+            progress = _progress(args, stream, "rank", unit="configs")
+            all_configs = sortConfigs(args.b, args.c, error_map, progress)
+            if progress is not None:
+                progress.close()
+        n = args.num_configs
+        if len(all_configs) > 2 * n:
+            configs = [all_configs[i][1] for i in range(n)] + [
+                all_configs[-i - 1][1] for i in range(n)
             ]
         else:
             configs = [all_configs[i][1] for i in range(len(all_configs))]
 
-    errs: List[List[int]] = [[] for _ in range(len(configs))]
-    errs_perc: List[List[float]] = [[] for _ in range(len(configs))]
-
     if configs == []:
         raise ValueError("No config loaded!")
 
-    # Generate random values, inject errors into them,
-    # and find the magnitude of the errors for all the configs
-    print("Running simulations...")
-    random.seed(0)
-    for i in range(args.iter_size):
-
-        mat = generateMatrix(b, c, args.arr_size)
-        out_mat = copy.deepcopy(mat)
+    # Each config is simulated on its own when it has its own error map,
+    # with the same stored values
+    groups = [(configs, error_map, None)]
+    if args.opt_reads:
+        reads, error_maps = optimalErrorMaps(configs, thr_map, b)
+        for config, read in zip(configs, reads):
+            print(f"Read thresholds of `{config}`: {np.round(read, 4).tolist()}")
+        if np.allclose(reads, reads[0], rtol=0, atol=1e-9):
+            # i.e. binary cells, which all read best at the same thresholds,
+            # still share one pass of the engine
+            groups = [(configs, error_maps[0], reads[0])]
+        else:
+            groups = [
+                ([config], em, read)
+                for config, em, read in zip(configs, error_maps, reads)
+            ]
 
-        injectFaults(out_mat, error_map, b)
+    if args.data is not None and args.tensor is not None:
+        _simulateTensor(args, groups, stream)
+        return
 
-        calcErrMagnitude(configs, mat, out_mat, errs, errs_perc)
+    # Stream values through fault injection and decoding chunk by chunk,
+    # so only one chunk of the array is ever held in memory
+    stats = []
+    if args.data is not None:
+        print(f"Running simulations on {args.data}...")
+        progress = _progress(args, stream, "simulate")
+        for group, em, _ in groups:
+            rng = np.random.default_rng(0)
+            stats += simulateWords(
+                group,
+                readWords(args.data, args.dtype, args.chunk_size),
+                em,
+                rng,
+                progress,
+            )
+        source = f"{stats[0].values} numbers from {args.data}"
+    else:
+        print("Running simulations...")
+        gen = generatePackedChunks if args.packed else generateChunks
+        ecc_stats = []
+        kernel = None if args.coupling is None else couplingKernel(*args.coupling)
+        values = args.iter_size * args.arr_size
+        progress = _progress(
+            args, stream, "simulate", values * len(groups) * args.replicates
+        )
+        sums = []
+        for group, em, read in groups:
+            if sampled:
+                group_stats, group_sums, batch_values = _simulateSampled(
+                    args, group, em, progress
+                )
+                stats += group_stats
+                sums.append(group_sums)
+                continue
+            if args.jobs > 1:
+                stats += simulateParallel(
+                    group,
+                    em,
+                    values,
+                    args.chunk_size,
+                    args.jobs,
+                    packed=args.packed,
+                    thr_maps=thr_map,
+                    kernel=kernel,
+                    reads=read,
+                    progress=progress,
+                )
+                continue
+            rng = np.random.default_rng(0)
+            chunks = gen(b, c, values, args.chunk_size, rng)
+            if kernel is not None:
+                pairs = coupledFaultChunks(chunks, thr_map, b, kernel, rng, read)
+            else:
+                pairs = faultChunks(chunks, em, rng)
+            if args.ecc is not None:
+                code = CODES[args.ecc](b * c, args.ecc_words)
+                ecc_stats += simulateECC(group, code, pairs, progress)
+            else:
+                stats += ConfigEngine(group).run(pairs, progress)
+        stats = stats or [st.residual for st in ecc_stats]
+        source = f"{args.arr_size} numbers for {args.iter_size} iterations"
+        if sampled:
+            source += f", {args.replicates} {args.sampler} replicates"
+    if progress is not None:
+        progress.close()
+    if stream is not None and stream is not sys.stdout:
+        stream.close()
 
     # Print the results of the simulation
-    print(
-        f"{len(configs[0])} {len(configs[0][0])}-bit cells, {args.iter_size*args.arr_size} numbers tested:"
-    )
+    print(f"{c} {b}-bit cells, {stats[0].values} numbers tested:")
     print(
         "| Config | Error count | Error mean | Error Stdev | Error perc |\n|-|-|-|-|-|"
     )
-    # for i in range(len(configs)):
-    #     print(f"Config {i}: {configs[i]}")
-
-    # for i, err in enumerate(errs):
-    #     if len(err) == 0:
-    #         print(f"Config {i} did not have errors")
-    #     else:
-    #         avg_err = np.average(err)
-    #         avg_err_perc = avg_err / 2 ** (b * c) * 100
-    #         print(
-    #             f"Config {i} error count: {len(err):6d}, mean: {avg_err:8.3f}, stdev: {np.std(err):8.3f}, perc: {avg_err_perc:7.3f}%"
-    #         )
-
-    for i, err in enumerate(errs):
-        avg_err = np.average(err)
-        avg_err_perc = avg_err / 2 ** (b * c) * 100
+    for config, st in zip(configs, stats):
         print(
-            f"| `{configs[i]}` | {len(err):4d} | {avg_err:6.3f} | {stdev(err):6.3f} | {avg_err_perc:7.3f}% |"
+            f"| `{config}` | {st.count:4d} | {st.mean:6.3f} | {st.stdev:6.3f} | {st.perc:7.3f}% |"
         )
 
-    if args.plot:
-        plt.hist(
-            errs_perc,
-            bins=[x / 20 for x in range(0, 21)],
-            align="mid",
-            weights=np.array(
-                [
-                    [1 / len(errs_perc[i]) for _ in range(len(errs_perc[i]))]
-                    for i in range(len(errs_perc))
-                ]
-            ),
+    if sampled:
+        mean, half, diff, diff_half = intervals(np.concatenate(sums), batch_values)
+        if args.sampler == "sobol":
+            method = f"{args.replicates} scrambled Sobol replicates"
+        else:
+            method = f"{len(batch_values)} chunks of pseudo-random values"
+        print(f"\n95% confidence intervals over {method}:")
+        print("| Config | Error per value | Difference to first config |\n|-|-|-|")
+        for i, config in enumerate(configs):
+            print(
+                f"| `{config}` | {mean[i]:.6g} ± {half[i]:.3g} | {diff[i]:.6g} ± {diff_half[i]:.3g} |"
+            )
+
+    if args.ecc is not None:
+        print(
+            f"\n{args.ecc} over {args.ecc_words} word(s), errors above are after correction:"
         )
-        plt.title(
-            f"Distribution of errors for {c} {b}-bit cells, {args.arr_size} numbers for {args.iter_size} iterations, using {args.thr}"
+        print(
+            "| Config | Raw error count | Raw error mean | Faulted codewords | Corrected | Detected | Silent |\n|-|-|-|-|-|-|-|"
         )
-        plt.gca().yaxis.set_major_formatter(PercentFormatter(1))
-        plt.gca().set_ylim([0, 1])
-        plt.xlabel("Percentage error")
-        plt.ylabel("Number of errors")
-        plt.legend([f"{configs[i]}" for i in range(len(errs_perc))])
+        for config, st in zip(configs, ecc_stats):
+            print(
+                f"| `{config}` | {st.raw.count:4d} | {st.raw.mean:6.3f} | {st.faulted:4d} | {st.corrected:4d} | {st.detected:4d} | {st.silent:4d} |"
+            )
+
+    plot = histogramPlot(
+        f"Distribution of errors for {c} {b}-bit cells, {source}, using {args.thr}",
+        [histogramSeries(f"{config}", st) for config, st in zip(configs, stats)],
+    )
+    if args.hist_out is not None:
+        with open(args.hist_out, "w") as f:
+            json.dump(plot, f)
+    if args.plot_out is not None:
+        renderPlot(plot, args.plot_out)
+    if args.plot:
+        import matplotlib.pyplot as plt  # type: ignore
+
+        drawHistograms(plt.figure().gca(), plot)
         plt.show()
 
 
+def _simulateSampled(
+    args: argparse.Namespace, group, error_map, progress: Optional[Progress]
+):
+    # every replicate of the group is seeded by its index, so all groups
+    # share the same values and fault uniforms
+    engine = ConfigEngine(group)
+    values = args.iter_size * args.arr_size
+    sums = []
+    batch_values = []
+    for seed in range(args.replicates):
+        if args.sampler == "sobol":
+            chunks = sobolChunks(args.b, args.c, values, args.chunk_size, seed)
+            pairs = sampledFaultChunks(chunks, error_map, args.b, args.packed)
+        else:
+            rng = np.random.default_rng(seed)
+            gen = generatePackedChunks if args.packed else generateChunks
+            chunks = gen(args.b, args.c, values, args.chunk_size, rng)
+            pairs = faultChunks(chunks, error_map, rng)
+        s, v = batchRun(engine, pairs, args.sampler == "random", progress)
+        sums.append(s)
+        batch_values.append(v)
+    return engine.results(), np.concatenate(sums, 1), np.concatenate(batch_values)
+
+
+def _simulateTensor(args: argparse.Namespace, groups, stream: Optional[TextIO]):
+    print(f"Running simulations on {args.data} as {args.tensor}...")
+    progress = _progress(args, stream, "simulate")
+    configs = []
+    stats = []
+    for group, error_map, _ in groups:
+        configs += group
+        stats += simulateTensor(
+            group,
+            readTensor(args.data, args.tensor, args.chunk_size),
+            args.tensor,
+            error_map,
+            np.random.default_rng(0),
+            progress,
+        )
+    if progress is not None:
+        progress.close()
+    if stream is not None and stream is not sys.stdout:
+        stream.close()
+
+    print(
+        f"{args.c} {args.b}-bit cells, {stats[0].values} {args.tensor} values tested:"
+    )
+    print(
+        "| Config | Error count | Abs dev mean | Abs dev stdev | Rel dev mean | Zero ref errors | Max abs dev | NaN rate | Inf rate |\n|-|-|-|-|-|-|-|-|-|"
+    )
+    for config, st in zip(configs, stats):
+        print(
+            f"| `{config}` | {st.count:4d} | {st.mean:8.4g} | {st.stdev:8.4g} | {st.rel_mean:8.4g} | {st.zero_ref:4d} | {st.max:8.4g} | {st.nan_rate:.3e} | {st.inf_rate:.3e} |"
+        )
+
+
 if __name__ in ("__main__", "mlcsim.simulation"):
     _main(sys.argv[1:])
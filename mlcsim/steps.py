@@ -8,13 +8,16 @@ all the possible configurations.
 ```
 $ python -m mlcsim.steps --help
 
-usage: steps.py [-h] [-b {2,3,4}] [-c {2,3,4,5,6,7,8}] --thr THR
+usage: steps.py [-h] [-b {2,3,4,5,6,7,8}] [-c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}] --thr THR
+                [--opt-reads]
 
 options:
-  -h, --help          show this help message and exit
-  -b {2,3,4}          bits per cell
-  -c {2,3,4,5,6,7,8}  num of cells\
-  --thr THR           Threshold map JSO
+  -h, --help            show this help message and exit
+  -b {2,3,4,5,6,7,8}    bits per cell
+  -c {2,3,4,5,6,7,8,9,10,11,12,13,14,15,16}
+                        num of cells
+  --thr THR             Threshold map JSON
+  --opt-reads           rank each config with its optimized read thresholds
 ```
 
 Prints out a pretty markdown table
@@ -69,11 +72,13 @@ from ast import Import
 import json
 
 try:
-    from cconfigs import sortConfigs  # type: ignore
+    from cconfigs import findAllConfigs, sortConfigs  # type: ignore
     from dist import genErrorMap  # type: ignore
+    from reads import optimalErrorMaps, rankConfigs  # type: ignore
 except ImportError:
-    from mlcsim.cconfigs import sortConfigs
+    from mlcsim.cconfigs import findAllConfigs, sortConfigs
     from mlcsim.dist import genErrorMap
+    from mlcsim.reads import optimalErrorMaps, rankConfigs
 
 
 def _main():
@@ -81,12 +86,18 @@ def _main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        "-b", type=int, default=2, choices=[2, 3, 4], help="bits per cell"
+        "-b", type=int, default=2, choices=range(2, 9), help="bits per cell"
     )
     parser.add_argument(
-        "-c", type=int, default=2, choices=[2, 3, 4, 5, 6, 7, 8], help="num of cells"
+        "-c", type=int, default=2, choices=range(2, 17), help="num of cells"
     )
     parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument(
+        "--opt-reads",
+        action="store_true",
+        default=False,
+        help="rank each config with its optimized read thresholds",
+    )
 
     args = parser.parse_args()
 
@@ -96,9 +107,12 @@ def _main():
     with open(args.thr) as f:
         thr_map = json.load(f)
 
-    error_map = genErrorMap(thr_map, b)
-
-    sums = sortConfigs(b, c, error_map)
+    if args.opt_reads:
+        configs = findAllConfigs(b, c)
+        sums = rankConfigs(configs, optimalErrorMaps(configs, thr_map, b)[1])
+    else:
+        error_map = genErrorMap(thr_map, b)
+        sums = sortConfigs(b, c, error_map)
 
     print(
         "|",
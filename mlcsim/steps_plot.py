@@ -3,7 +3,8 @@
 """Script for plotting different cell configurations
 
 When called directly as main, it will create a pyplot showing the
-steps sizes between each threshold level in an encoded MLC value.
+steps sizes between each threshold level in an encoded MLC value. With
+`-o`, it is rendered headless to a PNG or SVG file instead of shown.
 
 3 cells, 3 bits per cell, `split-1` threshold distribution
 
@@ -15,19 +16,18 @@ steps sizes between each threshold level in an encoded MLC value.
 """
 
 from ast import Import
-from typing import List, Union
+from typing import List, Set, Union
 import numpy as np  # type: ignore
 import argparse
 import json
 
 import matplotlib.pyplot as plt  # type: ignore
 
-
 try:
-    from cconfigs import calcCellDeltaList, sortConfigs  # type: ignore
+    from cconfigs import Config, calcCellDeltaList, sortConfigs  # type: ignore
     from dist import genErrorMap  # type: ignore
 except ImportError:
-    from mlcsim.cconfigs import calcCellDeltaList, sortConfigs
+    from mlcsim.cconfigs import Config, calcCellDeltaList, sortConfigs
     from mlcsim.dist import genErrorMap
 
 
@@ -36,12 +36,13 @@ def _main():
     parser = argparse.ArgumentParser()
 
     parser.add_argument(
-        "-b", type=int, default=2, choices=[2, 3, 4], help="bits per cell"
+        "-b", type=int, default=2, choices=range(2, 9), help="bits per cell"
     )
     parser.add_argument(
-        "-c", type=int, default=2, choices=[2, 3, 4, 5, 6, 7, 8], help="num of cells"
+        "-c", type=int, default=2, choices=range(2, 17), help="num of cells"
     )
     parser.add_argument("--thr", required=True, help="Threshold map JSON")
+    parser.add_argument("-o", help="render the plot to a PNG or SVG file")
 
     args = parser.parse_args()
 
@@ -60,16 +61,21 @@ def _main():
     )
 
     steps: List[List[List[List[int]]]] = []
+    seen: Set[Config] = set()
     for config in configs:
+        cfg = Config.fromList(config[1]).canonical()
+        if cfg in seen:
+            continue
+        seen.add(cfg)
         config_steps: List[List[int]] = []
         for cell in config[1]:
             config_steps.append(calcCellDeltaList(cell))
-        n = [config_steps, config[1], config[0], config[2]]
-        if n not in steps:
-            steps.append(n)
+        steps.append([config_steps, config[1], config[0], config[2]])
 
     print(steps)
 
+    if args.o is not None:
+        plt.switch_backend("Agg")
     fig, axs = plt.subplots(len(steps), sharex=True)
     plt.legend([f"Cell {j}" for j in reversed(range(len(steps[0])))])
     plt.yticks(range(0, 2 ** (b * c), 2))
@@ -92,7 +98,10 @@ def _main():
         axs[i].set_yscale("symlog", base=2)  # type: ignore
 
     fig.tight_layout()  # type: ignore
-    plt.show()
+    if args.o is not None:
+        fig.savefig(args.o)  # type: ignore
+    else:
+        plt.show()
 
 
 if __name__ == "__main__":
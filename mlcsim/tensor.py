@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+"""Typed tensor functions
+
+This module provides functions for storing floating-point and quantized
+tensors (`float16`, `bfloat16`, `float32`, `int8`, `int16`) in MLCs. The bit
+pattern of each element is stored through a cell configuration as is, and
+errors are reported as the numeric deviation of the decoded element, along
+with the rate at which faults turn finite elements into NaN or Inf.
+
+All functions work on whole arrays at once.
+"""
+
+from typing import Dict, Generator, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from MLCSim import MLCSim  # type: ignore
+    from mat import injectFaultsArray  # type: ignore
+    from progress import Progress  # type: ignore
+except ImportError:
+    from mlcsim.MLCSim import MLCSim
+    from mlcsim.mat import injectFaultsArray
+    from mlcsim.progress import Progress
+
+# storage dtype name -> (dtype of the bit pattern, dtype of the values)
+TYPES: Dict[str, Tuple[str, Optional[str]]] = {
+    "float16": ("uint16", "float16"),
+    "bfloat16": ("uint16", None),
+    "float32": ("uint32", "float32"),
+    "int8": ("uint8", "int8"),
+    "int16": ("uint16", "int16"),
+}
+
+
+def bitWidth(dtype: str) -> int:
+    """Number of bits of a storage dtype
+
+    Args:
+        dtype (str): Storage dtype name
+
+    Returns:
+        int: Bits per element
+    """
+    return np.dtype(TYPES[dtype][0]).itemsize * 8
+
+
+def toBits(arr: np.ndarray, dtype: str) -> np.ndarray:
+    """Convert a tensor to the bit patterns of a storage dtype
+
+    Floating-point tensors are rounded to the storage dtype if needed
+    (round-to-nearest-even for `bfloat16`). Integer tensors must already
+    be of the storage dtype.
+
+    Args:
+        arr (np.ndarray): Tensor to convert
+        dtype (str): Storage dtype name
+
+    Raises:
+        ValueError: If dtype is unknown or arr can't be converted to it
+
+    Returns:
+        np.ndarray: Flat uint64 array of bit patterns
+    """
+    if dtype not in TYPES:
+        raise ValueError(f"Unknown tensor dtype: {dtype}")
+    bits_dtype, val_dtype = TYPES[dtype]
+    arr = np.asarray(arr).reshape(-1)
+
+    if dtype == "bfloat16":
+        if arr.dtype == np.uint16:
+            return arr.astype(np.uint64)
+        if arr.dtype.kind != "f":
+            raise ValueError(f"Can't convert {arr.dtype} to {dtype}")
+        u = arr.astype(np.float32).view(np.uint32).astype(np.uint64)
+        bits = (u + ((u >> np.uint64(16)) & np.uint64(1)) + np.uint64(0x7FFF)) >> (
+            np.uint64(16)
+        )
+        bits[np.isnan(arr)] = 0x7FC0
+        return bits & np.uint64(0xFFFF)
+
+    if arr.dtype == np.dtype(val_dtype) or arr.dtype == np.dtype(bits_dtype):
+        return arr.view(bits_dtype).astype(np.uint64)
+    if arr.dtype.kind == "f" and np.dtype(val_dtype).kind == "f":
+        return arr.astype(val_dtype).view(bits_dtype).astype(np.uint64)
+    raise ValueError(f"Can't convert {arr.dtype} to {dtype}")
+
+
+def fromBits(bits: np.ndarray, dtype: str) -> np.ndarray:
+    """Convert bit patterns of a storage dtype back to their values
+
+    Args:
+        bits (np.ndarray): Bit patterns
+        dtype (str): Storage dtype name
+
+    Returns:
+        np.ndarray: float64 array of values
+    """
+    bits_dtype, val_dtype = TYPES[dtype]
+    bits = np.asarray(bits).astype(bits_dtype)
+    if dtype == "bfloat16":
+        return (
+            (bits.astype(np.uint32) << np.uint32(16))
+            .view(np.float32)
+            .astype(np.float64)
+        )
+    assert val_dtype is not None
+    return bits.view(val_dtype).astype(np.float64)
+
+
+def readTensor(
+    path: str, dtype: str, chunk_size: int = 2**16
+) -> Generator[np.ndarray, None, None]:
+    """Stream the bit patterns of a tensor out of a `.npy` or raw binary file
+
+    A `.npy` file is converted to the storage dtype chunk by chunk, a raw
+    file must already hold elements of the storage dtype. The file is
+    memory-mapped, so it can be larger than RAM.
+
+    Args:
+        path (str): Path to a `.npy` or raw binary file
+        dtype (str): Storage dtype name
+        chunk_size (int): Number of elements per chunk
+
+    Yields:
+        np.ndarray: Chunk of bit patterns as a uint64 array
+    """
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+    else:
+        data = np.memmap(path, dtype=TYPES[dtype][0], mode="r")
+    data = data.reshape(-1)
+
+    for start in range(0, len(data), chunk_size):
+        yield toBits(np.ascontiguousarray(data[start : start + chunk_size]), dtype)
+
+
+class TensorStats:
+    def __init__(self):
+        """init TensorStats
+
+        Running statistics of the numeric deviation between stored and
+        decoded tensor elements for one config.
+        """
+        self.values = 0
+        self.count = 0
+        self.nan = 0
+        self.inf = 0
+        self.finite = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.rel_sum = 0.0
+        self.rel_count = 0
+        self.zero_ref = 0
+        self.max = 0.0
+
+    def update(self, clean: np.ndarray, dirty: np.ndarray):
+        """Add a chunk of clean and decoded values
+
+        Args:
+            clean (np.ndarray): Stored values
+            dirty (np.ndarray): Decoded values
+        """
+        self.values += len(clean)
+        src_finite = np.isfinite(clean)
+        changed = (clean != dirty) & ~(np.isnan(clean) & np.isnan(dirty))
+        self.count += int(changed.sum())
+        self.nan += int((src_finite & np.isnan(dirty)).sum())
+        self.inf += int((src_finite & np.isinf(dirty)).sum())
+
+        mask = changed & src_finite & np.isfinite(dirty)
+        dev = np.abs(dirty[mask] - clean[mask])
+        if len(dev) == 0:
+            return
+        n = len(dev)
+        mean = float(dev.mean())
+        m2 = float(((dev - mean) ** 2).sum())
+        total = self.finite + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta**2 * self.finite * n / total
+        self.finite = total
+        self.max = max(self.max, float(dev.max()))
+        # the relative deviation of a faulted zero is undefined, count it apart
+        ref = np.abs(clean[mask])
+        nonzero = ref > 0
+        self.zero_ref += n - int(nonzero.sum())
+        self.rel_count += int(nonzero.sum())
+        self.rel_sum += float((dev[nonzero] / ref[nonzero]).sum())
+
+    @property
+    def stdev(self) -> float:
+        """Sample stdev of the finite absolute deviations"""
+        return (self.m2 / (self.finite - 1)) ** 0.5 if self.finite > 1 else float("nan")
+
+    @property
+    def rel_mean(self) -> float:
+        """Mean finite relative deviation of the non-zero stored values"""
+        return self.rel_sum / self.rel_count if self.rel_count else float("nan")
+
+    @property
+    def nan_rate(self) -> float:
+        """Fraction of values turned into NaN"""
+        return self.nan / self.values if self.values else 0.0
+
+    @property
+    def inf_rate(self) -> float:
+        """Fraction of values turned into +-Inf"""
+        return self.inf / self.values if self.values else 0.0
+
+
+def simulateTensor(
+    configs: List[List[List[int]]],
+    chunks: Iterable[np.ndarray],
+    dtype: str,
+    error_map: List[List[float]],
+    rng: np.random.Generator,
+    progress: Optional[Progress] = None,
+) -> List[TensorStats]:
+    """Store a tensor with each config, inject faults and measure the deviation
+
+    Args:
+        configs (list): Cell configurations, with at least `bitWidth(dtype)` bits
+        chunks (iterable): Chunks of bit patterns, i.e. from `readTensor`
+        dtype (str): Storage dtype name
+        error_map (list): Error map
+        rng (np.random.Generator): Random number generator
+        progress (Progress): Progress to report the elements to
+
+    Raises:
+        ValueError: If a config has too few bits for the dtype
+
+    Returns:
+        list: `TensorStats` of each config
+    """
+    mlcs = [MLCSim(config) for config in configs]
+    for mlc in mlcs:
+        if mlc.L < bitWidth(dtype):
+            raise ValueError(f"{mlc.L}-bit config can't store {dtype} values")
+    stats = [TensorStats() for _ in mlcs]
+
+    for bits in chunks:
+        clean = fromBits(bits, dtype)
+        for mlc, stat in zip(mlcs, stats):
+            dirty = injectFaultsArray(mlc.encArray(bits), error_map, rng)
+            # faults in unused high bits are outside of the element
+            dec = mlc.decArray(dirty) & np.uint64(2 ** bitWidth(dtype) - 1)
+            stat.update(clean, fromBits(dec, dtype))
+        if progress is not None:
+            progress.update(len(bits))
+
+    return stats
@@ -106,7 +106,7 @@ def _main():
 
     thr_map = {}
 
-    for b in range(2, 5):
+    for b in range(2, 9):
         if args.scale_e:
             e = args.e * 6 / (2 ** (b + 1) - 2)
         else: